@@ -1,14 +1,45 @@
-from .base_generic_list import (  # noqa: F401
-    sort_alphanumeric,
-    sort_versions,
-)
-from .lister_generic import GenericLister  # noqa: F401
-from .lister_github import GithubLister  # noqa: F401
-from .downloader_generic import GenericDownloader  # noqa: F401
-from .downloader_github import GithubDownloader  # noqa: F401
-from .installer_generic import GenericInstaller  # noqa: F401
-from .version_constraint import (  # noqa: F401
-    VersionConstraint,
-    constraint_from_tf_file,
-    constraint_from_tf_string,
-)
+import os
+import sys
+import importlib
+
+# public name -> submodule, imported on first access to keep the startup of
+# the bin/* scripts fast (e.g. list-all never loads tarfile or zipfile)
+_exports = {
+    "sort_alphanumeric": "base_generic_list",
+    "sort_versions": "base_generic_list",
+    "GenericLister": "lister_generic",
+    "GithubLister": "lister_github",
+    "GenericDownloader": "downloader_generic",
+    "GithubDownloader": "downloader_github",
+    "GenericInstaller": "installer_generic",
+    "LegacyFiles": "legacy_file",
+    "VersionConstraint": "version_constraint",
+    "ConstraintResolver": "version_constraint",
+    "resolve_constraints": "version_constraint",
+    "constraint_from_tf_file": "version_constraint",
+    "constraint_from_tf_path": "version_constraint",
+    "constraint_from_tf_dir": "version_constraint",
+    "constraint_from_tf_string": "version_constraint",
+}
+__all__ = list(_exports)
+
+
+def __getattr__(name: str) -> any:
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_exports])
+
+
+# with a running helper daemon the bin/* scripts of installed plugins are
+# thin clients, see daemon
+if os.environ.get("ASDF_PLUGIN_DAEMON") and sys.argv and sys.argv[0]:
+    from .daemon import delegate
+
+    delegate(os.environ["ASDF_PLUGIN_DAEMON"])
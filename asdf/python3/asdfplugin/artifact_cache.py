@@ -0,0 +1,146 @@
+import os
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import contextlib
+
+# ioctl request to clone (reflink) a file on btrfs, xfs & co.
+FICLONE = 0x40049409
+
+
+def link_or_copy(source_path: str, target_path: str):
+    """
+    Place source_path at target_path without copying data if possible:
+    hardlink, then reflink, then a regular (sendfile based) copy.
+    """
+    if os.path.lexists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+        return
+    except OSError:
+        pass
+    reflink_or_copy(source_path, target_path)
+
+
+def reflink_or_copy(source_path: str, target_path: str):
+    """
+    Copy source_path to target_path as a reflink if the file system
+    supports it, else as a regular (sendfile based) copy.
+    Unlike a hardlink the copy never shares its inode (& mode) with source.
+    """
+    if os.path.lexists(target_path):
+        os.remove(target_path)
+    with open(source_path, "rb") as src, open(target_path, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source_path, target_path)
+
+
+class ArtifactCache(object):
+    """
+    ArtifactCache is a content addressed store of downloaded files, which
+    can be shared between plugins, versions, users & concurrent processes.
+    Entries are keyed by download url plus expected digest and evicted
+    least recently used first once the cache exceeds max_size.
+    Entries are stored & placed as copies (reflinks where possible), so
+    installing & chmod'ing a downloaded file never changes the cache.
+
+    path:
+    - the directory to store the artifacts in
+
+    max_size:
+    - the maximum size of all artifacts in bytes
+    - default: $ASDF_PLUGIN_ARTIFACT_CACHE_SIZE MiB or 4096 MiB
+    """
+
+    def __init__(self, path: str, max_size: int | None = None):
+        self.path = path
+        if max_size is None:
+            mib = int(os.environ.get("ASDF_PLUGIN_ARTIFACT_CACHE_SIZE", "4096"))
+            max_size = mib * 1024 * 1024
+        self.max_size = max_size
+
+    @classmethod
+    def from_env(cls) -> "ArtifactCache | None":
+        """
+        Returns the ArtifactCache at $ASDF_PLUGIN_ARTIFACT_CACHE.
+        Returns None if the variable isn't set, as the cache is opt-in.
+        """
+        path = os.environ.get("ASDF_PLUGIN_ARTIFACT_CACHE")
+        return cls(path) if path else None
+
+    def entry_path(self, url: str, digest: str | None) -> str:
+        """Returns the path of the artifact for url & digest."""
+        key = hashlib.sha256(f"{url}\n{digest or ''}".encode()).hexdigest()
+        return os.path.join(self.path, "objects", key[:2], key)
+
+    @contextlib.contextmanager
+    def lock(self, operation: int):
+        """Hold a shared (LOCK_SH) or exclusive (LOCK_EX) cache lock."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "a") as fh:
+            fcntl.flock(fh.fileno(), operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def fetch(self, url: str, digest: str | None, target_path: str) -> bool:
+        """
+        Place the cached artifact for url & digest at target_path.
+        Returns false on a cache miss.
+        """
+        entry_path = self.entry_path(url, digest)
+        with self.lock(fcntl.LOCK_SH):
+            if not os.path.isfile(entry_path):
+                return False
+            # the mtime is the last use for the LRU eviction
+            os.utime(entry_path)
+            reflink_or_copy(entry_path, target_path)
+        return True
+
+    def store(self, url: str, digest: str | None, source_path: str):
+        """Add the downloaded source_path to the cache & evict old entries."""
+        entry_path = self.entry_path(url, digest)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(entry_path))
+        os.close(fd)
+        try:
+            reflink_or_copy(source_path, tmp_path)
+            with self.lock(fcntl.LOCK_EX):
+                os.replace(tmp_path, entry_path)
+                self.evict()
+        finally:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """
+        Remove least recently used entries until max_size is met.
+        Temporary files of concurrent store() calls are skipped, they are
+        created outside of the lock and may vanish at any time.
+        """
+        entries = list()
+        for dir_path, _, files in os.walk(os.path.join(self.path, "objects")):
+            for file in files:
+                if file.startswith("."):
+                    continue
+                file_path = os.path.join(dir_path, file)
+                try:
+                    st = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, file_path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_path in entries:
+            if total <= self.max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(file_path)
+            total -= size
@@ -1,4 +1,4 @@
-import os
+from .environment import environ
 import re
 import platform
 from typing import Self
@@ -24,16 +24,16 @@ class GenericInstallBase(object):
     def _init_env(self):
         """Check and load ASDF_* environment variables."""
         # ASDF_DOWNLOAD_PATH = /home/user/.asdf/downloads/sops/3.9.4
-        self.download_path = os.environ.get("ASDF_DOWNLOAD_PATH")
+        self.download_path = environ().get("ASDF_DOWNLOAD_PATH")
         assert self.download_path is not None, "ASDF_DOWNLOAD_PATH missing"
         # ASDF_INSTALL_PATH = /home/user/.asdf/installs/sops/3.9.4
-        self.install_path = os.environ.get("ASDF_INSTALL_PATH")
+        self.install_path = environ().get("ASDF_INSTALL_PATH")
         assert self.install_path is not None, "ASDF_INSTALL_PATH missing"
         # ASDF_INSTALL_VERSION = 3.9.4
-        self.install_version = os.environ.get("ASDF_INSTALL_VERSION")
+        self.install_version = environ().get("ASDF_INSTALL_VERSION")
         assert self.install_version is not None, "ASDF_INSTALL_VERSION missing"
         # ASDF_INSTALL_TYPE = version | ref
-        self.install_type = os.environ.get("ASDF_INSTALL_TYPE")
+        self.install_type = environ().get("ASDF_INSTALL_TYPE")
         assert (
             self.install_type == "version"
         ), 'only ASDF_INSTALL_TYPE "version" supported'
@@ -74,14 +74,14 @@ class GenericInstallBase(object):
         return pf, arch
 
     def template(self, string: str, **kwargs: dict[str, any]) -> str:
-        """Render a string with platform, arch, version & kwargs."""
+        """
+        Render a string with platform, arch, version & kwargs.
+        kwargs can override platform & arch (e.g. to render urls for other
+        systems).
+        """
         pf, arch = self.get_arch()
-        return string.format(
-            arch=arch,
-            platform=pf,
-            version=self.install_version,
-            **kwargs,
-        )
+        values = {"arch": arch, "platform": pf, "version": self.install_version}
+        return string.format(**{**values, **kwargs})
 
     def modify(self, **kwargs: dict[str, any]) -> Self:
         """
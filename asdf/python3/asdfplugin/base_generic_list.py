@@ -1,20 +1,41 @@
+from .tracing import current_span, traced
+from .version_cache import NotModified, VersionCache
+from .version_constraint import SortedVersions, constraint_from_tf_string
 import re
-from packaging.version import Version
-from typing import Self
+import sys
+from typing import Iterable, Self
 
 
-def sort_alphanumeric(versions: list[str]) -> list[str]:
+def sort_alphanumeric(versions: Iterable[str]) -> list[str]:
     """Sort versions alphabetically."""
+    if not isinstance(versions, list):
+        versions = list(versions)
     versions.sort()
     return versions
 
 
-def sort_versions(versions: list[str]) -> list[str]:
-    """Sort versions by its major, minor & patch version."""
-    versions.sort(key=Version)
+def sort_versions(versions: Iterable[str]) -> list[str]:
+    """
+    Sort versions by its major, minor & patch version.
+    Plain release versions are compared as int tuples, only other versions
+    are parsed by packaging's Version, see SortedVersions.
+    """
+    if not isinstance(versions, list):
+        return SortedVersions(versions).versions
+    versions[:] = SortedVersions(versions).versions
     return versions
 
 
+def upstream_unavailable(error: OSError) -> bool:
+    """
+    Returns true if error means upstream couldn't be reached or failed
+    (connection errors, timeouts & 5xx responses), not that it refused
+    the request (e.g. 401 or 404).
+    """
+    response = getattr(error, "response", None)
+    return response is None or response.status_code >= 500
+
+
 class GenericListBase(object):
     """
     GenericListBase provides the basic implementation of list_all().
@@ -22,8 +43,21 @@ class GenericListBase(object):
     deduplication, sorting and output is already implemented here.
     The modify(kwargs) function can be used to override attributes in a
     chainable way.
+
+    cache:
+    - VersionCache to store the final versions in, None disables caching
+    - default: VersionCache() unless disabled by ASDF_PLUGIN_CACHE=0
+    - if upstream can't be reached, the cached versions are used
+        regardless of their age
     """
 
+    def __init__(self):
+        self.cache = VersionCache() if VersionCache.enabled() else None
+        # ETag / Last-Modified of the cached upstream response
+        self.validators = None
+        # the versions last sorted by sort_versions(), with their sort keys
+        self.sorted_versions = None
+
     def list_all(
         self,
         filter: str = r"^v?((?:[0-9]+\.){2}[0-9]+)$",
@@ -42,10 +76,116 @@ class GenericListBase(object):
         print(" ".join(self.get_final_versions(filter)))
         return self
 
+    def latest_stable(
+        self,
+        filter: str = r"^v?((?:[0-9]+\.){2}[0-9]+)$",
+        query: str | None = None,
+    ) -> Self:
+        r"""
+        Implements asdf's latest-stable functionality.
+
+        filter:
+        - the same filter as for list_all()
+        - default semver (stable): r"^v?((?:[0-9]+\.){2}[0-9]+)$"
+
+        query:
+        - only consider versions starting with query (e.g. "1.2")
+        - or matching query if it's a constraint (e.g. "~> 1.2", see
+            constraint_from_tf_string)
+        - default: the command line argument passed by asdf, if any
+
+        Returns self to allow chaining.
+        """
+        if query is None:
+            query = " ".join(sys.argv[1:])
+        version = self.get_latest_stable(filter, query)
+        if version is not None:
+            print(version)
+        return self
+
+    @traced("latest_stable")
+    def get_latest_stable(self, filter: str, query: str = "") -> str | None:
+        """
+        Returns the latest version matching filter & query.
+        Fresh cached versions are used as they are, otherwise find_latest()
+        asks upstream, which may stop as soon as the answer is certain.
+        Returns None if no version matches.
+        """
+        self.version_filter = re.compile(filter)
+        if self.cache is not None:
+            entry = self.cache.load(self.cache.key(self.cache_id(), filter))
+            if entry is not None and self.cache.is_fresh(entry):
+                current_span().set(cache="fresh")
+                return self.latest_of(entry["versions"], query)
+        return self.find_latest(query)
+
+    def find_latest(self, query: str = "") -> str | None:
+        """
+        Returns the latest version matching query from upstream.
+        Override this in actual implementation if there is a shortcut to
+        fetching all versions.
+        """
+        versions = self.get_final_versions(self.version_filter.pattern)
+        return self.latest_of(versions, query)
+
+    def latest_of(self, versions: Iterable[str], query: str = "") -> str | None:
+        """
+        Returns the latest of versions matching query, in the order of
+        sort_versions().
+        Returns None if no version matches.
+        """
+        query = query.strip()
+        if query[:1] in ("<", ">", "=", "!", "~"):
+            return constraint_from_tf_string(query).latest_matching(list(versions))
+        matching = [v for v in versions if v.startswith(query)]
+        if not matching:
+            return None
+        return self.sort_versions(matching)[-1]
+
+    @traced("list")
     def get_final_versions(self, filter: str) -> list[str]:
         """Returns the final, deduplicated and sorted versions list."""
         self.version_filter = re.compile(filter)
-        return self.sort_versions(list(set(self.get_versions())))
+        # only revalidate with what belongs to the entry of this filter
+        self.validators = None
+        if self.cache is None:
+            return self.fetch_versions()
+        key = self.cache.key(self.cache_id(), filter)
+        entry = self.cache.load(key)
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                current_span().set(cache="fresh")
+                return entry["versions"]
+            self.validators = entry.get("validators")
+        try:
+            versions = self.fetch_versions()
+            current_span().set(cache="miss" if entry is None else "changed")
+        except NotModified:
+            current_span().set(cache="not modified")
+            versions = entry["versions"]
+        except OSError as e:
+            # offline or upstream down (requests' errors are OSErrors)
+            if entry is None or not upstream_unavailable(e):
+                raise
+            current_span().set(cache="fallback")
+            print(f"using cached versions: {e}", file=sys.stderr)
+            return entry["versions"]
+        self.cache.store(key, {"versions": versions, "validators": self.validators})
+        return versions
+
+    @traced("get_versions")
+    def fetch_versions(self) -> list[str]:
+        """Returns the deduplicated and sorted versions from upstream."""
+        versions = self.sort_versions(set(self.get_versions()))
+        current_span().set(versions=len(versions))
+        return versions
+
+    def cache_id(self) -> list[any]:
+        """
+        Returns what identifies the upstream source of the versions.
+        Override this in actual implementation.
+        """
+        return [self.__class__.__name__]
 
     def get_versions(self) -> list[str]:
         """
@@ -54,9 +194,26 @@ class GenericListBase(object):
         """
         return []
 
-    def sort_versions(self, versions: list[str]) -> list[str]:
-        """Sort versions for output."""
-        return sort_versions(versions)
+    def sort_versions(self, versions: Iterable[str]) -> list[str]:
+        """
+        Sort versions for output.
+        Keeps them with their sort keys in self.sorted_versions, see
+        get_sorted_versions().
+        """
+        self.sorted_versions = SortedVersions(versions)
+        return self.sorted_versions.versions
+
+    def get_sorted_versions(self, filter: str) -> SortedVersions:
+        """
+        Returns get_final_versions(filter) as SortedVersions, which can be
+        queried by VersionConstraint.latest_matching() or a
+        ConstraintResolver without parsing the versions again.
+        """
+        versions = self.get_final_versions(filter)
+        if self.sorted_versions is None or self.sorted_versions.versions != versions:
+            # served from the cache or sorted by another sort_versions
+            self.sorted_versions = SortedVersions(versions)
+        return self.sorted_versions
 
     def modify(self, **kwargs: dict[str, any]) -> Self:
         """
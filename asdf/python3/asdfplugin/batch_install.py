@@ -0,0 +1,227 @@
+from .environment import capture_stdout, override_environ
+from .tracing import start_run
+from .version_cache import asdf_data_dir
+import io
+import os
+import sys
+import time
+import shutil
+import runpy
+import argparse
+import traceback
+import multiprocessing
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+
+
+class BatchTool(object):
+    """BatchTool holds state & timings of a single tool of the batch."""
+
+    def __init__(self, name: str, version: str):
+        self.name = name
+        self.version = version
+        self.status = "pending"
+        self.output = ""
+        self.timings = {"resolve": 0.0, "download": 0.0, "install": 0.0}
+
+    @property
+    def plugin_path(self) -> str:
+        return os.path.join(asdf_data_dir(), "plugins", self.name)
+
+    @property
+    def install_path(self) -> str:
+        return os.path.join(asdf_data_dir(), "installs", self.name, self.version)
+
+    @property
+    def download_path(self) -> str:
+        return os.path.join(asdf_data_dir(), "downloads", self.name, self.version)
+
+    def script(self, command: str) -> str:
+        return os.path.join(self.plugin_path, "bin", command)
+
+    def env(self) -> dict[str, str]:
+        """Returns the ASDF_* environment for the plugin scripts."""
+        return {
+            "ASDF_PLUGIN_PATH": self.plugin_path,
+            "ASDF_INSTALL_TYPE": "version",
+            "ASDF_INSTALL_VERSION": self.version,
+            "ASDF_INSTALL_PATH": self.install_path,
+            "ASDF_DOWNLOAD_PATH": self.download_path,
+        }
+
+
+def parse_tool_versions(file: io.TextIOBase) -> list[BatchTool]:
+    """
+    Returns the tools of a .tool-versions file.
+    Only the first version of a tool is used, system/ref/path are skipped.
+    """
+    tools = list()
+    for line in file:
+        tokens = line.split("#", 1)[0].split()
+        if len(tokens) < 2:
+            continue
+        version = tokens[1]
+        if version == "system" or version.startswith(("ref:", "path:")):
+            continue
+        tools.append(BatchTool(tokens[0], version))
+    return tools
+
+
+def run_script(script: str, env: dict[str, str]) -> str:
+    """
+    Run a plugin script in the current thread with env on top of the
+    process environment & return its output.
+    Raises RuntimeError, including the output, if the script fails.
+    """
+    with override_environ(env), capture_stdout() as output:
+        start_run(script)
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                raise RuntimeError(f"{script} exited with {e.code}")
+        except Exception:
+            raise RuntimeError(output.getvalue() + traceback.format_exc())
+    return output.getvalue()
+
+
+def resolve_and_download(tool: BatchTool) -> BatchTool:
+    """Resolve latest[:prefix] versions & run the plugin's download."""
+    start = time.perf_counter()
+    if tool.version == "latest" or tool.version.startswith("latest:"):
+        prefix = tool.version.partition(":")[2]
+        versions = run_script(tool.script("list-all"), tool.env()).split()
+        versions = [v for v in versions if v.startswith(prefix)]
+        if not versions:
+            raise RuntimeError(f"no version matching {tool.version}")
+        tool.version = versions[-1]
+    tool.timings["resolve"] = time.perf_counter() - start
+    if os.path.isdir(tool.install_path):
+        tool.status = "installed"
+        return tool
+    start = time.perf_counter()
+    os.makedirs(tool.download_path, exist_ok=True)
+    if os.path.isfile(tool.script("download")):
+        tool.output += run_script(tool.script("download"), tool.env())
+    tool.timings["download"] = time.perf_counter() - start
+    return tool
+
+
+class BatchInstaller(object):
+    """
+    BatchInstaller installs multiple tools with their asdf plugins in a
+    single process. Versions are resolved (latest, latest:<prefix>) and
+    downloaded on a thread pool, archives are extracted on a process pool.
+    Run `asdf reshim` afterwards to create the shims.
+
+    python3 -m asdfplugin.batch_install [-j 8] .tool-versions
+    python3 -m asdfplugin.batch_install terraform=1.10.5 kubectl=latest
+
+    download_workers:
+    - threads resolving & downloading tools concurrently
+
+    install_workers:
+    - processes extracting & installing tools concurrently
+    """
+
+    def __init__(self, download_workers: int = 8, install_workers: int = 0):
+        self.download_workers = download_workers
+        self.install_workers = install_workers or os.cpu_count() or 1
+
+    def install(self, tools: list[BatchTool]) -> bool:
+        """Install all tools, returns true if none failed."""
+        missing = [t for t in tools if not os.path.isdir(t.plugin_path)]
+        for tool in missing:
+            tool.status = "no plugin"
+        tools_todo = [t for t in tools if t not in missing]
+        context = multiprocessing.get_context("spawn")
+        with (
+            ThreadPoolExecutor(max_workers=self.download_workers) as threads,
+            ProcessPoolExecutor(self.install_workers, mp_context=context) as procs,
+        ):
+            downloads = {threads.submit(resolve_and_download, t): t for t in tools_todo}
+            installs: dict[Future, tuple[BatchTool, float]] = dict()
+            for future in as_completed(downloads):
+                tool = downloads[future]
+                if self.failed(tool, future) or tool.status == "installed":
+                    continue
+                os.makedirs(tool.install_path, exist_ok=True)
+                install_future = procs.submit(
+                    run_script, tool.script("install"), tool.env()
+                )
+                installs[install_future] = (tool, time.perf_counter())
+            for future in as_completed(installs):
+                tool, start = installs[future]
+                tool.timings["install"] = time.perf_counter() - start
+                if self.failed(tool, future):
+                    shutil.rmtree(tool.install_path, ignore_errors=True)
+                    continue
+                tool.output += future.result()
+                tool.status = "ok"
+        return all(t.status in ("ok", "installed") for t in tools)
+
+    def failed(self, tool: BatchTool, future: Future) -> bool:
+        """Record the error of a failed future, returns true on failure."""
+        error = future.exception()
+        if error is None:
+            return False
+        tool.status = "failed"
+        tool.output += f"{error}\n"
+        print(f"{tool.name} {tool.version} failed:\n{error}", file=sys.stderr)
+        return True
+
+    def summary(self, tools: list[BatchTool]) -> str:
+        """Returns the per tool timing table."""
+        header = ("tool", "version", "resolve", "download", "install", "status")
+        rows = [header] + [
+            (
+                t.name,
+                t.version,
+                *(f"{t.timings[phase]:.2f}s" for phase in header[2:5]),
+                t.status,
+            )
+            for t in tools
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if i in (0, 1, 5) else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            ).rstrip()
+            for row in rows
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python3 -m asdfplugin.batch_install",
+        description="Install many asdf tools in one process.",
+    )
+    parser.add_argument(
+        "tools",
+        nargs="*",
+        default=[".tool-versions"],
+        help="a .tool-versions file or name=version pairs",
+    )
+    parser.add_argument("-j", "--download-workers", type=int, default=8)
+    parser.add_argument("-p", "--install-workers", type=int, default=0)
+    args = parser.parse_args(argv)
+    tools = list()
+    for arg in args.tools:
+        if "=" in arg:
+            tools.append(BatchTool(*arg.split("=", 1)))
+        else:
+            with open(arg, "r") as fh:
+                tools.extend(parse_tool_versions(fh))
+    installer = BatchInstaller(args.download_workers, args.install_workers)
+    ok = installer.install(tools)
+    print(installer.summary(tools))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+from .tracing import start_run
+from .version_cache import asdf_data_dir
+import io
+import os
+import sys
+import json
+import runpy
+import socket
+import argparse
+import importlib
+import traceback
+import socketserver
+import contextlib
+
+
+def default_socket_path() -> str:
+    """Returns the default socket path $ASDF_DATA_DIR/asdfplugin.sock."""
+    return os.path.join(asdf_data_dir(), "asdfplugin.sock")
+
+
+def is_plugin_script(path: str) -> bool:
+    """Returns true if path is a $ASDF_DATA_DIR/plugins/<plugin>/bin/* script."""
+    bin_path = os.path.dirname(os.path.abspath(path))
+    plugins_path = os.path.join(os.path.abspath(asdf_data_dir()), "plugins")
+    return (
+        os.path.basename(bin_path) == "bin"
+        and os.path.dirname(os.path.dirname(bin_path)) == plugins_path
+    )
+
+
+def delegate(socket_path: str, timeout: float = 0.2):
+    """
+    Run the current bin/* script in the helper daemon listening on
+    socket_path, print its output & exit with its exit code.
+    Returns without doing anything if the script isn't one of an installed
+    plugin or the daemon isn't reachable or doesn't answer, so the script
+    just runs locally.
+    """
+    if not is_plugin_script(sys.argv[0]):
+        return
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return
+    request = {
+        "script": os.path.abspath(sys.argv[0]),
+        "argv": sys.argv,
+        "env": dict(os.environ),
+        "cwd": os.getcwd(),
+    }
+    with client, client.makefile("rwb") as stream:
+        client.settimeout(None)
+        try:
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+            response = json.loads(stream.readline())
+        except (OSError, ValueError):
+            # the daemon went away without answering
+            return
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    sys.exit(response["code"])
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """
+    DaemonHandler runs a single script request of a client.
+    Each request is handled in its own forked process (see Daemon), so
+    changing os.environ, cwd & sys.argv doesn't affect other requests.
+    """
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        response = self.run(request)
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    def run(self, request: dict) -> dict:
+        """Run the requested script in the client's environment."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        code = 0
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv = request["argv"]
+        start_run(request["script"])
+        try:
+            os.chdir(request["cwd"])
+            with (
+                contextlib.redirect_stdout(stdout),
+                contextlib.redirect_stderr(stderr),
+            ):
+                try:
+                    runpy.run_path(request["script"], run_name="__main__")
+                except SystemExit as e:
+                    if isinstance(e.code, int):
+                        code = e.code
+                    elif e.code is not None:
+                        print(e.code, file=sys.stderr)
+                        code = 1
+        except Exception:
+            stderr.write(traceback.format_exc())
+            code = 1
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
+
+
+class Daemon(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Daemon is a long-lived helper process serving the bin/* scripts of all
+    plugins over a unix socket. It keeps python & the imported modules
+    warm, the scripts only send their argv, environment & cwd and print
+    the result.
+    Every request runs in a process forked from the daemon, so requests
+    run concurrently and state derived from the environment (the HTTP
+    session with its mirrors & offline mode, tracing) is set up from the
+    client's environment instead of the daemon's.
+
+    python3 -m asdfplugin.daemon &
+    export ASDF_PLUGIN_DAEMON=~/.asdf/asdfplugin.sock
+    """
+
+    def __init__(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        # the socket runs code with the client's environment, owner only
+        umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, DaemonHandler)
+        finally:
+            os.umask(umask)
+
+
+def preload():
+    """
+    Import the plugin modules & requests up front, so the forked request
+    processes start with them loaded. Nothing environment dependent is set
+    up here.
+    """
+    import requests  # noqa: F401
+    from . import _exports
+
+    for module in sorted(set(_exports.values())):
+        importlib.import_module(f".{module}", __package__)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m asdfplugin.daemon",
+        description="Serve the asdf plugin scripts from a warm process.",
+    )
+    parser.add_argument("socket", nargs="?", default=default_socket_path())
+    args = parser.parse_args(argv)
+    preload()
+    with Daemon(args.socket) as daemon:
+        print(f"listening on {args.socket}")
+        try:
+            daemon.serve_forever()
+        finally:
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
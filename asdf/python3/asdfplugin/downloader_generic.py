@@ -1,17 +1,147 @@
+from __future__ import annotations
+from .artifact_cache import ArtifactCache
 from .base_generic_install import GenericInstallBase
+from .environment import environ
+from .tracing import current_span, propagate, traced
+from .version_cache import plugin_name
+import io
 import os
-import requests
-from typing import Self
+import re
+import json
+import shutil
+import hashlib
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, BinaryIO, Self
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+
+bsd_checksum_line = re.compile(r"^\w+ \((.+)\) = ([0-9a-fA-F]+)$")
+
+
+def parse_checksums(text: str, name: str) -> str | None:
+    """
+    Returns the digest of file name from the content of a checksum file.
+    Supports "<digest>  <file>" lines (sha256sum), "<algo> (<file>) = <digest>"
+    lines (BSD) and files which only contain a single digest (*.sha256).
+    Returns None if there is no digest for name.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if len(lines) == 1 and len(lines[0].split()) == 1:
+        return lines[0].lower()
+    for line in lines:
+        match = bsd_checksum_line.match(line)
+        if match:
+            digest, file = match.group(2), match.group(1)
+        else:
+            tokens = line.split()
+            if len(tokens) < 2:
+                continue
+            digest, file = tokens[0], tokens[-1].lstrip("*")
+        if file.removeprefix("./") == name or os.path.basename(file) == name:
+            return digest.lower()
+    return None
+
+
+def file_digest(path: str, algorithm: str) -> str:
+    """Returns the hex digest of the file at path."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, algorithm).hexdigest()
+
+
+class HashingReader(io.RawIOBase):
+    """
+    HashingReader feeds everything read from stream into hasher and
+    writes it to sink, if given.
+    """
+
+    def __init__(self, stream, hasher, sink=None):
+        self.stream = stream
+        self.hasher = hasher
+        self.sink = sink
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(None if size < 0 else size)
+        if self.hasher is not None:
+            self.hasher.update(data)
+        if self.sink is not None:
+            self.sink.write(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
 
 
 class GenericDownloader(GenericInstallBase):
     """
     GenericDownloader downloads files from a given url.
+    Downloads go to a "<target>.part" file first, which is renamed when
+    complete, so an interrupted download is resumed by a Range request
+    (with If-Range, so a file changed meanwhile is downloaded again).
 
     url:
     - the base url to append files to download
     - "{filename}" will be replaced with the files to download
     - if url doesn't contain "{filename}" then "/{filename}" will be added to it
+
+    session:
+    - the requests.Session to use, shared by all listers & downloaders
+
+    chunk_size:
+    - buffer size used to stream the download to disk
+    - default: 1 MiB
+
+    parallel_parts:
+    - split downloads into this many byte ranges fetched in parallel
+    - only applies if the server supports ranges & the file is big enough
+    - default: $ASDF_PLUGIN_DOWNLOAD_PARTS or 1 (disabled)
+
+    parallel_min_size:
+    - minimum file size in bytes to download in parallel parts
+    - default: 16 MiB
+
+    checksum_file:
+    - the checksum file published next to the file to download
+        (e.g. "checksums.txt", "SHA256SUMS" or "{filename}.sha256")
+    - can be a pattern to template, "{filename}" is the file to download
+    - the download is hashed while it streams in and removed on mismatch,
+        an already downloaded file with a matching digest is kept
+    - default: None (no verification)
+
+    checksum_algorithm:
+    - the hashlib algorithm of checksum_file
+    - default: "sha256"
+
+    artifact_cache:
+    - ArtifactCache shared between plugins & versions, None disables it
+    - default: ArtifactCache at $ASDF_PLUGIN_ARTIFACT_CACHE if set
+
+    keep_archive:
+    - download_member() writes the archive next to the extracted member,
+        so an interrupted download is resumed & a present one reused
+    - without it (& without artifact_cache) the archive is never written
+    - default: $ASDF_PLUGIN_KEEP_ARCHIVE or false
+
+    prefetch_path:
+    - if set, download() & download_member() don't download for this
+        system, but the file for every platform & arch (see prefetch())
+    - default: $ASDF_PLUGIN_PREFETCH_PATH
+
+    prefetch_platforms:
+    - the platforms to prefetch, the arches are the arch_*_value mappings
+    - default: ["linux", "darwin", "windows"]
+
+    prefetch_workers:
+    - number of files to prefetch concurrently
+    - default: 8
     """
 
     def __init__(self, url: str):
@@ -21,7 +151,33 @@ class GenericDownloader(GenericInstallBase):
             self.url += "/{filename}"
         self.headers = None
         self.params = None
+        self._session = None
+        self.chunk_size = 1024 * 1024
+        self.parallel_parts = int(os.environ.get("ASDF_PLUGIN_DOWNLOAD_PARTS", "1"))
+        self.parallel_min_size = 16 * 1024 * 1024
+        self.checksum_file = None
+        self.checksum_algorithm = "sha256"
+        self.artifact_cache = ArtifactCache.from_env()
+        keep_archive = environ().get("ASDF_PLUGIN_KEEP_ARCHIVE", "0").lower()
+        self.keep_archive = keep_archive not in ("", "0", "no", "off", "false")
+        self.prefetch_path = environ().get("ASDF_PLUGIN_PREFETCH_PATH")
+        self.prefetch_platforms = ["linux", "darwin", "windows"]
+        self.prefetch_workers = 8
+
+    @property
+    def session(self) -> requests.Session:
+        """The requests.Session to use, the shared one is set up on first use."""
+        if self._session is None:
+            from .session import get_session
 
+            self._session = get_session()
+        return self._session
+
+    @session.setter
+    def session(self, session: requests.Session):
+        self._session = session
+
+    @traced("download")
     def download(self, file: str, target: str = "") -> Self:
         """
         Implements asdf's download functionality.
@@ -37,19 +193,444 @@ class GenericDownloader(GenericInstallBase):
 
         Returns self to allow chaining.
         """
+        if self.prefetch_path:
+            return self.prefetch(file)
+        if not target:
+            target = self.default_local_file
+        target = self.template(target)
+        url = self.get_download_url(file)
+        target_path = os.path.join(self.download_path, target)
+        current_span().set(url=url)
+        digest = self.get_checksum(file)
+        if self.reuse(url, digest, target_path):
+            return self
+        current_span().set(source="network")
+        print(f"downloading {url} to {target_path}")
+        part_path = target_path + ".part"
+        if self.parallel_parts <= 1 or os.path.isfile(part_path):
+            self.download_resumable(url, target_path, digest)
+        elif not self.download_parallel(url, target_path, digest):
+            self.download_resumable(url, target_path, digest)
+        if self.artifact_cache is not None:
+            self.artifact_cache.store(url, digest, target_path)
+        return self
+
+    def reuse(self, url: str, digest: str | None, target_path: str) -> bool:
+        """
+        Returns true if target_path is already downloaded with a matching
+        digest, or could be placed from the artifact cache.
+        """
+        if digest is not None and os.path.isfile(target_path):
+            if file_digest(target_path, self.checksum_algorithm) == digest:
+                print(f"{target_path} already downloaded, checksum matches")
+                current_span().set(source="present")
+                return True
+        if self.artifact_cache is not None:
+            if self.artifact_cache.fetch(url, digest, target_path):
+                print(f"using cached {url} for {target_path}")
+                current_span().set(source="artifact cache")
+                return True
+        return False
+
+    @traced("download_member")
+    def download_member(self, file: str, member: str, target: str = "") -> Self:
+        """
+        Download an archive and extract a single member of it on the fly,
+        so only the executable is written to disk, never the archive.
+        Combined with GenericInstaller's install({"name": None}) this is a
+        download & install pipeline for single binary releases.
+        With keep_archive or an artifact_cache the archive is written as
+        well while it streams in, so it can be resumed, cached & reused;
+        the member is then extracted from the local archive.
+
+        file:
+        - the zip or (gzip, bz2, xz or zstd compressed) tar archive to
+            download from GenericDownloader's url
+        - can be a pattern to template (e.g. "foo-{platform}-{arch}.zip")
+
+        member:
+        - the path of the file to extract from the archive
+        - can be a pattern to template (e.g. "foo-{platform}-{arch}/foo")
+
+        target:
+        - the target file name to store the extracted member to
+        - can be a pattern to template (e.g. "downloaded.{platform}-{arch}")
+        - defaults to self.default_local_file from GenericInstallBase
+
+        Returns self to allow chaining.
+        """
+        from .extractor_stream import member_name
+
+        if self.prefetch_path:
+            return self.prefetch(file)
         if not target:
             target = self.default_local_file
         target = self.template(target)
+        member = member_name(self.template(member))
         url = self.get_download_url(file)
         target_path = os.path.join(self.download_path, target)
+        archive_path = os.path.join(
+            self.download_path, os.path.basename(urlparse(url).path)
+        )
+        part_path = archive_path + ".part"
+        digest = self.get_checksum(file)
+        current_span().set(url=url, member=member)
+        present = os.path.isfile(archive_path)
+        if self.reuse(url, digest, archive_path) or os.path.isfile(part_path):
+            if not os.path.isfile(archive_path):
+                current_span().set(source="network")
+                print(f"downloading {url} to {archive_path}")
+                self.download_resumable(url, archive_path, digest)
+                if self.artifact_cache is not None:
+                    self.artifact_cache.store(url, digest, archive_path)
+            print(f"extracting {member} from {archive_path} to {target_path}")
+            with open(archive_path, "rb") as f:
+                self.extract_member(f, member, target_path + ".part", url)
+            os.replace(target_path + ".part", target_path)
+            if not self.keep_archive and not present:
+                os.remove(archive_path)
+            return self
+        current_span().set(source="network")
+        hasher = hashlib.new(self.checksum_algorithm) if digest else None
+        write_archive = self.keep_archive or self.artifact_cache is not None
+        print(f"downloading {url} extracting {member} to {target_path}")
+        with self.session.get(url, stream=True) as r:
+            r.raise_for_status()
+            r.raw.decode_content = True
+            if write_archive:
+                self.store_validator(part_path + ".validator", r)
+            with open(part_path, "wb") if write_archive else nullcontext() as sink:
+                raw = HashingReader(r.raw, hasher, sink)
+                self.extract_member(raw, member, target_path + ".part", url)
+                if hasher is not None or write_archive:
+                    # the digest covers the whole archive, not just the member
+                    while raw.read(self.chunk_size):
+                        pass
+        current_span().set(bytes=os.path.getsize(target_path + ".part"))
+        if not write_archive:
+            actual = hasher and hasher.hexdigest()
+            self.verify(target_path + ".part", digest, actual)
+            os.replace(target_path + ".part", target_path)
+            return self
+        if os.path.isfile(part_path + ".validator"):
+            os.remove(part_path + ".validator")
+        try:
+            self.verify(part_path, digest, hasher and hasher.hexdigest())
+        except ValueError:
+            os.remove(target_path + ".part")
+            raise
+        os.replace(part_path, archive_path)
+        if self.artifact_cache is not None:
+            self.artifact_cache.store(url, digest, archive_path)
+        os.replace(target_path + ".part", target_path)
+        if not self.keep_archive:
+            os.remove(archive_path)
+        return self
+
+    def extract_member(self, stream: BinaryIO, member: str, path: str, url: str):
+        """
+        Extract member of the zip or tar archive read from stream to path.
+        The member's crc32 (zip) is verified before returning.
+        """
+        from .extractor_stream import (
+            is_tar,
+            is_zip,
+            iter_tar_members,
+            iter_zip_members,
+            open_decompressed,
+        )
+
+        stream = open_decompressed(stream)
+        head = stream.peek(512)
+        if is_zip(head):
+            members = iter_zip_members(stream)
+        elif is_tar(head):
+            members = iter_tar_members(stream)
+        else:
+            raise ValueError(f"{url} is neither a zip nor a tar archive")
+        try:
+            for name, open_member in members:
+                if name == member:
+                    with open_member() as f_in, open(path, "wb") as f_out:
+                        shutil.copyfileobj(f_in, f_out, self.chunk_size)
+                    # advancing past the member reads its trailer & checks the crc
+                    next(members, None)
+                    break
+            else:
+                raise FileNotFoundError(f"{member} not found in {url}")
+        except BaseException:
+            if os.path.isfile(path):
+                os.remove(path)
+            raise
+        members.close()
+
+    def prefetch(self, file: str) -> Self:
+        """
+        Download file for every combination of prefetch_platforms and the
+        arch_*_value mappings concurrently into
+        <prefetch_path>/<plugin>/<version>/<platform>-<arch>/, e.g. to fill
+        a mirror for air-gapped systems.
+        Files already present are kept if a HEAD request confirms them by
+        ETag (or Last-Modified & size), interrupted downloads are resumed.
+        Combinations the server doesn't have (404) are skipped.
+        The upstream urls are recorded in <prefetch_path>/index.json, so
+        the tree can serve as a file:// mirror (see MirrorAdapter).
+
+        Returns self to allow chaining.
+        """
+        root = os.path.join(self.prefetch_path, plugin_name(), self.install_version)
+        targets = self.prefetch_targets()
+        prefetch_file = propagate(self.prefetch_file)
+        with ThreadPoolExecutor(max_workers=self.prefetch_workers) as executor:
+            futures = [
+                executor.submit(prefetch_file, file, root, pf, arch)
+                for pf, arch in targets
+            ]
+            results = [future.result() for future in futures]
+        counts = {result: results.count(result) for result in sorted(set(results))}
+        print(
+            f"prefetched {len(targets)} platforms to {root}: "
+            + ", ".join(f"{count} {result}" for result, count in counts.items())
+        )
+        return self
+
+    def prefetch_targets(self) -> list[tuple[str, str]]:
+        """Returns all (platform, arch) combinations to prefetch."""
+        platforms = [
+            pf if self.platform_lower else pf.capitalize()
+            for pf in self.prefetch_platforms
+        ]
+        arches = [
+            self.arch_amd64_value,
+            self.arch_arm64_value,
+            self.arch_386_value,
+            self.arch_ppc64_value,
+            self.arch_s390_value,
+        ]
+        return [(pf, arch) for pf in platforms for arch in dict.fromkeys(arches)]
+
+    def prefetch_file(self, file: str, root: str, pf: str, arch: str) -> str:
+        """
+        Prefetch file for a single platform & arch.
+        Returns "downloaded", "current" or "missing".
+        """
+        from .mirror import update_index
+
+        url = self.get_download_url(file, platform=pf, arch=arch)
+        target_path = os.path.join(
+            root, f"{pf}-{arch}", os.path.basename(urlparse(url).path)
+        )
+        meta_path = target_path + ".meta.json"
+        r = self.session.head(url, allow_redirects=True)
+        if r.status_code == 404:
+            return "missing"
+        r.raise_for_status()
+        length = r.headers.get("Content-Length", "")
+        meta = {
+            "url": url,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "size": int(length) if length.isdigit() else None,
+        }
+        relative_path = os.path.relpath(target_path, self.prefetch_path)
+        if os.path.isfile(target_path) and os.path.isfile(meta_path):
+            with open(meta_path, "r") as f:
+                known = json.load(f)
+            if known["etag"] == meta["etag"] and (
+                meta["etag"] is not None
+                or known["last_modified"] == meta["last_modified"]
+            ):
+                if meta["size"] in (None, os.path.getsize(target_path)):
+                    update_index(self.prefetch_path, {url: relative_path})
+                    return "current"
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        digest = self.get_checksum(file, platform=pf, arch=arch)
         print(f"downloading {url} to {target_path}")
-        with requests.get(url, stream=True) as r:
+        self.download_resumable(url, target_path, digest)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        update_index(self.prefetch_path, {url: relative_path})
+        return "downloaded"
+
+    @traced("checksum")
+    def get_checksum(self, file: str, **kwargs: dict[str, any]) -> str | None:
+        """
+        Returns the expected digest of file from checksum_file.
+        Returns None if checksum_file isn't configured.
+        kwargs are passed to template (e.g. platform & arch).
+        """
+        if not self.checksum_file:
+            return None
+        name = os.path.basename(self.template(file, **kwargs))
+        checksum_file = self.template(self.checksum_file, filename=name, **kwargs)
+        url = self.get_download_url(checksum_file, **kwargs)
+        r = self.session.get(url)
+        r.raise_for_status()
+        digest = parse_checksums(r.text, name)
+        if digest is None:
+            raise ValueError(f"no checksum for {name} in {url}")
+        return digest
+
+    def verify(self, path: str, digest: str | None, actual: str | None):
+        """Remove path and raise ValueError if actual isn't digest."""
+        if digest is None:
+            return
+        if actual != digest:
+            os.remove(path)
+            raise ValueError(
+                f"{self.checksum_algorithm} mismatch of {path}: "
+                f"expected {digest}, got {actual}"
+            )
+        print(f"{self.checksum_algorithm} checksum {digest} verified")
+
+    @traced("transfer")
+    def download_resumable(
+        self,
+        url: str,
+        target_path: str,
+        digest: str | None = None,
+    ):
+        """
+        Download url to target_path via a ".part" file, continuing an
+        existing ".part" file with a Range request. The validator of the
+        first response is sent as If-Range, on a 200 the download restarts.
+        If digest is given the download is hashed on the fly and verified
+        before the ".part" file is renamed.
+        """
+        part_path = target_path + ".part"
+        validator_path = part_path + ".validator"
+        offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+        hasher = hashlib.new(self.checksum_algorithm) if digest else None
+        headers = None
+        current_span().set(url=url, resumed_at=offset)
+        if offset:
+            print(f"resuming at byte {offset}")
+            headers = {"Range": f"bytes={offset}-", "Accept-Encoding": "identity"}
+            if os.path.isfile(validator_path):
+                with open(validator_path, "r") as f:
+                    headers["If-Range"] = f.read()
+        with self.session.get(url, stream=True, headers=headers) as r:
+            if r.status_code == 416 and self.content_size(r) != offset:
+                # the part file can't be continued, start over
+                os.remove(part_path)
+                return self.download_resumable(url, target_path, digest)
+            elif r.status_code != 416:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    # a fresh download, or the file changed since the part
+                    offset = 0
+                    self.store_validator(validator_path, r)
+                if hasher is not None and offset:
+                    with open(part_path, "rb") as f:
+                        hashlib.file_digest(f, lambda: hasher)
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                current_span().set(bytes=os.path.getsize(part_path) - offset)
+            elif hasher is not None:
+                with open(part_path, "rb") as f:
+                    hashlib.file_digest(f, lambda: hasher)
+        if os.path.isfile(validator_path):
+            os.remove(validator_path)
+        self.verify(part_path, digest, hasher and hasher.hexdigest())
+        os.replace(part_path, target_path)
+
+    def store_validator(self, validator_path: str, response: requests.Response):
+        """
+        Store the strong ETag or Last-Modified of response next to the
+        ".part" file, it's sent as If-Range when resuming, so a changed
+        file is downloaded again instead of being continued.
+        """
+        etag = response.headers.get("ETag")
+        validator = response.headers.get("Last-Modified")
+        if etag and not etag.startswith("W/"):
+            validator = etag
+        if validator:
+            with open(validator_path, "w") as f:
+                f.write(validator)
+        elif os.path.isfile(validator_path):
+            os.remove(validator_path)
+
+    def content_size(self, response: requests.Response) -> int | None:
+        """Returns the full size of a ranged response from Content-Range."""
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+
+    @traced("transfer_parallel")
+    def download_parallel(
+        self,
+        url: str,
+        target_path: str,
+        digest: str | None = None,
+    ) -> bool:
+        """
+        Download url to target_path in parallel_parts byte ranges, each
+        written into its place of a preallocated ".parts" file.
+        As the ranges arrive out of order, a given digest is verified by
+        reading the complete ".parts" file once.
+        Returns false if the server or the file size don't allow it.
+        The ".parts" file is removed if any range fails.
+        """
+        probe_headers = {"Range": "bytes=0-0", "Accept-Encoding": "identity"}
+        with self.session.get(url, stream=True, headers=probe_headers) as r:
             r.raise_for_status()
-            with open(target_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
+            size = self.content_size(r) if r.status_code == 206 else None
+        if size is None or size < self.parallel_min_size:
+            return False
+        parts_path = target_path + ".parts"
+        with open(parts_path, "wb") as f:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+            else:
+                f.truncate(size)
+        part_size = -(-size // self.parallel_parts)
+        ranges = [
+            (start, min(start + part_size, size) - 1)
+            for start in range(0, size, part_size)
+        ]
+        current_span().set(url=url, bytes=size, parts=len(ranges))
+        print(f"downloading {size} bytes in {len(ranges)} parts")
+        download_range = propagate(self.download_range)
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [
+                    executor.submit(download_range, url, parts_path, start, end)
+                    for start, end in ranges
+                ]
+                for future in futures:
+                    future.result()
+        except BaseException:
+            os.remove(parts_path)
+            raise
+        if digest is not None:
+            actual = file_digest(parts_path, self.checksum_algorithm)
+            self.verify(parts_path, digest, actual)
+        os.replace(parts_path, target_path)
+        return True
+
+    def download_range(self, url: str, parts_path: str, start: int, end: int):
+        """Download the byte range start-end of url into its place."""
+        headers = {"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"}
+        with self.session.get(url, stream=True, headers=headers) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise ValueError(f"range {start}-{end} of {url} not supported")
+            with open(parts_path, "r+b") as f:
+                f.seek(start)
+                written = 0
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
                     f.write(chunk)
-        return self
+                    written += len(chunk)
+        if written != end - start + 1:
+            raise ValueError(f"range {start}-{end} of {url} incomplete")
 
-    def get_download_url(self, file: str) -> str:
-        """Render the URL to download the given file from."""
-        return self.template(self.url, filename=self.template(file))
+    def get_download_url(self, file: str, **kwargs: dict[str, any]) -> str:
+        """
+        Render the URL to download the given file from.
+        kwargs are passed to template (e.g. platform & arch).
+        """
+        filename = self.template(file, **kwargs)
+        return self.template(self.url, filename=filename, **kwargs)
@@ -0,0 +1,62 @@
+import io
+import os
+import sys
+import threading
+import contextlib
+from typing import Iterator, Mapping
+
+_local = threading.local()
+
+
+def environ() -> Mapping[str, str]:
+    """
+    Returns the environment of the current thread, which is os.environ
+    unless overridden by override_environ().
+    """
+    return getattr(_local, "environ", None) or os.environ
+
+
+@contextlib.contextmanager
+def override_environ(env: Mapping[str, str]) -> Iterator[None]:
+    """
+    Run plugin code in the current thread with env on top of os.environ,
+    allowing multiple tools to be handled in one process.
+    """
+    previous = getattr(_local, "environ", None)
+    _local.environ = {**os.environ, **env}
+    try:
+        yield
+    finally:
+        _local.environ = previous
+
+
+class ThreadStdout(io.TextIOBase):
+    """ThreadStdout sends writes to the current thread's capture buffer."""
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def target(self):
+        return getattr(_local, "stdout", None) or self.stdout
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: str) -> int:
+        return self.target().write(data)
+
+    def flush(self):
+        self.target().flush()
+
+
+@contextlib.contextmanager
+def capture_stdout() -> Iterator[io.StringIO]:
+    """Capture everything the current thread prints (e.g. by list_all())."""
+    if not isinstance(sys.stdout, ThreadStdout):
+        sys.stdout = ThreadStdout(sys.stdout)
+    previous = getattr(_local, "stdout", None)
+    _local.stdout = io.StringIO()
+    try:
+        yield _local.stdout
+    finally:
+        _local.stdout = previous
@@ -0,0 +1,294 @@
+import io
+import os
+import gzip
+import zlib
+import struct
+import tarfile
+from typing import BinaryIO, Callable, Iterator
+
+# (name, magic bytes) of the supported compression formats
+compression_magic = [
+    ("gzip", b"\x1f\x8b"),
+    ("bz2", b"BZh"),
+    ("xz", b"\xfd7zXZ\x00"),
+    ("zstd", b"\x28\xb5\x2f\xfd"),
+]
+
+
+class PeekableStream(io.RawIOBase):
+    """
+    PeekableStream wraps a (non seekable) stream to allow looking at its
+    first bytes before handing it on, e.g. to tarfile's stream mode.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.head = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def unread(self, data: bytes):
+        """Push data back to be read again."""
+        self.head = data + self.head
+
+    def read_exact(self, size: int) -> bytes:
+        """Read exactly size bytes, raising ValueError at a premature end."""
+        data = self.read(size)
+        while len(data) < size:
+            chunk = self.read(size - len(data))
+            if not chunk:
+                raise ValueError("unexpected end of stream")
+            data += chunk
+        return data
+
+    def peek(self, size: int) -> bytes:
+        """Returns up to size bytes from the start without consuming them."""
+        while len(self.head) < size:
+            data = self.stream.read(size - len(self.head))
+            if not data:
+                break
+            self.head += data
+        return self.head[:size]
+
+    def read(self, size: int = -1) -> bytes:
+        if self.head:
+            if size < 0 or size >= len(self.head):
+                data, self.head = self.head, b""
+                rest = self.stream.read(-1 if size < 0 else size - len(data))
+                return data + (rest or b"")
+            data, self.head = self.head[:size], self.head[size:]
+            return data
+        return self.stream.read(size)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def detect_compression(head: bytes) -> str | None:
+    """Returns the compression format of a stream starting with head."""
+    for name, magic in compression_magic:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def open_zstd(stream: BinaryIO) -> BinaryIO:
+    """Returns a decompressing reader for a zstd stream."""
+    try:
+        from compression import zstd
+
+        return zstd.ZstdFile(stream)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd archives need python 3.14+ or the zstandard module")
+    return zstandard.ZstdDecompressor().stream_reader(stream)
+
+
+def open_decompressed(stream: BinaryIO) -> PeekableStream:
+    """
+    Returns a peekable, transparently decompressing reader for a stream
+    which may be gzip, bz2, xz or zstd compressed.
+    """
+    stream = PeekableStream(stream)
+    compression = detect_compression(stream.peek(6))
+    if compression == "gzip":
+        return PeekableStream(gzip.GzipFile(fileobj=stream))
+    if compression == "bz2":
+        import bz2
+
+        return PeekableStream(bz2.BZ2File(stream))
+    if compression == "xz":
+        import lzma
+
+        return PeekableStream(lzma.LZMAFile(stream))
+    if compression == "zstd":
+        return PeekableStream(open_zstd(stream))
+    return stream
+
+
+def is_tar(head: bytes) -> bool:
+    """Returns true if head is the start of a (ustar / gnu) tarball."""
+    return len(head) >= 262 and head[257:262] == b"ustar"
+
+
+def member_name(name: str) -> str:
+    """Normalize an archive member name (e.g. "./bin/foo" -> "bin/foo")."""
+    return os.path.normpath(name).lstrip(os.sep)
+
+
+def iter_tar_members(
+    stream: BinaryIO,
+) -> Iterator[tuple[str, Callable[[], BinaryIO]]]:
+    """
+    Yields (name, open) of all regular files of a tar stream in a single
+    pass. open() has to be called before advancing to the next member.
+    """
+    with tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            if member.isfile():
+                yield member_name(member.name), lambda m=member: tar.extractfile(m)
+
+
+zip_local_header = struct.Struct("<4sHHHHHIIIHH")
+zip_local_signature = b"PK\x03\x04"
+zip_descriptor_signature = b"PK\x07\x08"
+
+
+def is_zip(head: bytes) -> bool:
+    """Returns true if head is the start of a zip archive."""
+    return head.startswith(zip_local_signature)
+
+
+class ZipStreamMember(io.RawIOBase):
+    """
+    ZipStreamMember reads the data of a single zip member from a stream
+    positioned right behind its local file header, checking its crc32.
+    """
+
+    def __init__(
+        self,
+        stream: PeekableStream,
+        method: int,
+        compressed_size: int | None,
+        crc: int | None,
+    ):
+        if method not in (0, 8):
+            raise ValueError(f"zip compression method {method} not supported")
+        if method == 0 and compressed_size is None:
+            raise ValueError("stored zip member without size can't be streamed")
+        self.stream = stream
+        self.remaining = compressed_size
+        self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method else None
+        self.expected_crc = crc
+        self.crc = 0
+        self.consumed = 0
+        self.buffer = b""
+        self.done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def fill(self):
+        """Read & decompress the next chunk of member data."""
+        if self.remaining is None:
+            chunk = self.stream.read(65536)
+            if not chunk:
+                raise ValueError("unexpected end of stream")
+        else:
+            chunk = self.stream.read_exact(min(65536, self.remaining))
+        self.consumed += len(chunk)
+        if self.remaining is not None:
+            self.remaining -= len(chunk)
+        data = chunk
+        if self.decompressor is not None:
+            data = self.decompressor.decompress(chunk)
+            if self.decompressor.eof:
+                unused = self.decompressor.unused_data
+                self.stream.unread(unused)
+                self.consumed -= len(unused)
+                self.done = True
+        if self.remaining == 0:
+            self.done = True
+        self.crc = zlib.crc32(data, self.crc)
+        self.buffer += data
+
+    def finish(self) -> int:
+        """
+        Skip the rest of the member & check its crc32.
+        Returns the number of compressed bytes of the member.
+        """
+        while not self.done:
+            self.fill()
+            self.buffer = b""
+        return self.consumed
+
+    def check_crc(self, crc: int):
+        """Raise ValueError if the data read doesn't match crc."""
+        if self.crc != crc:
+            raise ValueError("zip member crc32 mismatch")
+
+    def read(self, size: int = -1) -> bytes:
+        while not self.done and (size < 0 or len(self.buffer) < size):
+            self.fill()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def iter_zip_members(
+    stream: PeekableStream,
+) -> Iterator[tuple[str, Callable[[], BinaryIO]]]:
+    """
+    Yields (name, open) of all files of a zip stream in a single pass,
+    reading the local file headers instead of the central directory at the
+    end of the archive. open() has to be called before advancing to the
+    next member.
+    """
+    while stream.peek(4) == zip_local_signature:
+        (
+            _,
+            _,
+            flags,
+            method,
+            _,
+            _,
+            crc,
+            compressed_size,
+            _,
+            name_length,
+            extra_length,
+        ) = zip_local_header.unpack(stream.read_exact(zip_local_header.size))
+        if flags & 0x1:
+            raise ValueError("encrypted zip members are not supported")
+        name = stream.read_exact(name_length).decode(
+            "utf-8" if flags & 0x800 else "cp437"
+        )
+        extra = stream.read_exact(extra_length)
+        has_descriptor = bool(flags & 0x8)
+        zip64 = compressed_size == 0xFFFFFFFF
+        if zip64:
+            compressed_size = zip64_compressed_size(extra)
+        member = ZipStreamMember(
+            stream,
+            method,
+            None if has_descriptor else compressed_size,
+            crc,
+        )
+        if not name.endswith("/"):
+            yield member_name(name), lambda m=member: m
+        consumed = member.finish()
+        if has_descriptor:
+            crc = read_zip_descriptor(stream, consumed, zip64)
+        member.check_crc(crc)
+
+
+def zip64_compressed_size(extra: bytes) -> int:
+    """Returns the compressed size from the zip64 extra field."""
+    while len(extra) >= 4:
+        header_id, size = struct.unpack("<HH", extra[:4])
+        if header_id == 0x0001:
+            return struct.unpack("<QQ", extra[4:20])[1]
+        extra = extra[4 + size :]
+    raise ValueError("zip64 extra field missing")
+
+
+def read_zip_descriptor(stream: PeekableStream, consumed: int, zip64: bool) -> int:
+    """Read the data descriptor following a zip member, returns its crc32."""
+    crc = stream.read_exact(4)
+    if crc == zip_descriptor_signature:
+        crc = stream.read_exact(4)
+    # compressed & uncompressed size, 8 bytes each for zip64 members
+    stream.read_exact(16 if zip64 or consumed >= 0xFFFFFFFF else 8)
+    return struct.unpack("<I", crc)[0]
@@ -1,13 +1,25 @@
+from .artifact_cache import link_or_copy
 from .base_generic_install import GenericInstallBase
+from .tracing import current_span, propagate, traced
+from .extractor_stream import (
+    is_tar,
+    iter_tar_members,
+    member_name,
+    open_decompressed,
+)
 import os
 import re
 import stat
+import errno
 import gzip
 import tarfile
 import zipfile
 import shutil
-import pathlib
-from typing import Self
+import tempfile
+import itertools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Self
 
 
 def is_gzip_file(filepath):
@@ -16,14 +28,67 @@ def is_gzip_file(filepath):
         return test_f.read(2) == b"\x1f\x8b"
 
 
+def pid_alive(pid: int) -> bool:
+    """Returns true if a process with pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+backreference = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def combine_patterns(patterns: list[re.Pattern]) -> re.Pattern | None:
+    """
+    Returns one alternation of patterns, which matches wherever any of
+    them matches, to rule out most names with a single search.
+    Returns None if there is nothing to gain or patterns can't be combined
+    (different flags, backreferences would refer to the wrong group).
+    """
+    if len(patterns) < 2 or len({p.flags for p in patterns}) != 1:
+        return None
+    if any(backreference.search(p.pattern) for p in patterns):
+        return None
+    try:
+        return re.compile(
+            "|".join(f"(?:{p.pattern})" for p in patterns), patterns[0].flags
+        )
+    except re.error:
+        return None
+
+
 class GenericInstaller(GenericInstallBase):
     """
     GenericInstaller extracts downloaded file and installs the executables
     from it.
+
+    stream_extract:
+    - extract only the members named by files straight into
+        ${ASDF_INSTALL_PATH}/bin/ in a single pass over the archive
+    - falls back to full extraction if a named member can't be found
+    - default: True
+
+    install_workers:
+    - number of downloaded files placed into the staging directory
+        concurrently (matters if they have to be copied across devices)
+    - default: 8
     """
 
     def __init__(self):
         super().__init__()
+        self.stream_extract = True
+        self.install_workers = 8
+        # relative paths of the files in download_path, see downloaded_files()
+        self.file_index = None
+        # staging directory of the current install transaction & the
+        # (source_path or None if already written, target) staged into it,
+        # see transaction()
+        self.staging = None
+        self.staged = list()
 
     def install(
         self,
@@ -66,16 +131,133 @@ class GenericInstaller(GenericInstallBase):
         source = self.template(source)
         source_path = os.path.join(self.download_path, source)
         assert os.path.isfile(source_path), f"{source_path} doesn't exist"
-        if is_gzip_file(source_path):
-            source = self.gunzip(source)
-        source_path = os.path.join(self.download_path, source)
-        if zipfile.is_zipfile(source_path):
-            self.unzip(source)
-        if tarfile.is_tarfile(source_path):
-            self.untar(source)
-        self.install_files(files, source)
+        with self.transaction():
+            if self.stream_extract:
+                if self.stream_install(files, source):
+                    return self
+                self.discard_staged()
+            if is_gzip_file(source_path):
+                source = self.gunzip(source)
+            source_path = os.path.join(self.download_path, source)
+            if zipfile.is_zipfile(source_path):
+                self.unzip(source)
+            if tarfile.is_tarfile(source_path):
+                self.untar(source)
+            self.install_files(files, source)
         return self
 
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Stage all executables installed within into a temporary directory
+        next to ${ASDF_INSTALL_PATH}/bin/ and move them into bin only once
+        all of them are in place, so a failure leaves bin untouched.
+        A fresh bin is swapped in by a single rename, an existing bin is
+        updated file by file (each one atomically, not bin as a whole).
+        Staging directories left behind by killed runs are removed.
+        Nested transactions join the outer one.
+        """
+        if self.staging is not None:
+            yield
+            return
+        os.makedirs(self.install_path, exist_ok=True)
+        self.remove_stale_staging()
+        self.staging = tempfile.mkdtemp(
+            prefix=f".bin-{os.getpid()}-", dir=self.install_path
+        )
+        os.chmod(self.staging, 0o755)
+        self.staged = list()
+        try:
+            yield
+            self.place_staged()
+            self.commit_staged()
+        finally:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self.staging = None
+            self.staged = list()
+
+    def remove_stale_staging(self):
+        """Remove the staging directories of processes which are gone."""
+        for name in os.listdir(self.install_path):
+            if not name.startswith(".bin-"):
+                continue
+            pid = name.split("-")[1]
+            if pid.isdigit() and pid_alive(int(pid)):
+                continue
+            shutil.rmtree(os.path.join(self.install_path, name), ignore_errors=True)
+
+    def stage_path(self, target: str, source_path: str | None = None) -> str:
+        """
+        Returns the path to stage target at, creating its directory.
+        source_path is placed there by place_staged() if given.
+        """
+        self.staged.append((source_path, target))
+        staged_path = os.path.join(self.staging, target)
+        os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+        if os.path.lexists(staged_path):
+            os.remove(staged_path)
+        return staged_path
+
+    def discard_staged(self):
+        """Drop everything staged so far, e.g. before retrying the install."""
+        shutil.rmtree(self.staging)
+        os.mkdir(self.staging)
+        os.chmod(self.staging, 0o755)
+        self.staged = list()
+
+    @traced("place")
+    def place_staged(self):
+        """Place all downloaded files queued by install_file concurrently."""
+        # the last source staged for a target wins
+        jobs = {
+            target: source_path
+            for source_path, target in self.staged
+            if source_path is not None
+        }
+        if not jobs:
+            return
+        workers = max(1, min(self.install_workers, len(jobs)))
+        place = propagate(self.place)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(place, source_path, os.path.join(self.staging, target))
+                for target, source_path in jobs.items()
+            ]
+            for future in futures:
+                future.result()
+
+    def place(self, source_path: str, staged_path: str):
+        """
+        Move source_path to staged_path, or hardlink, reflink or copy it if
+        download & install directory are on different devices, and make it
+        executable before it becomes visible in bin.
+        """
+        try:
+            os.rename(source_path, staged_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            link_or_copy(source_path, staged_path)
+        st = os.stat(staged_path)
+        x_bits = stat.S_IXGRP | stat.S_IXUSR | stat.S_IXOTH
+        os.chmod(staged_path, st.st_mode | x_bits)
+        current_span().add("files")
+        current_span().add("bytes", st.st_size)
+
+    def commit_staged(self):
+        """Move the staged executables into bin."""
+        bin_path = os.path.join(self.install_path, "bin")
+        if not self.staged:
+            return
+        if not os.path.exists(bin_path):
+            os.rename(self.staging, bin_path)
+            return
+        for target in dict.fromkeys(target for _, target in self.staged):
+            target_path = os.path.join(bin_path, target)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.replace(os.path.join(self.staging, target), target_path)
+
+    @traced("gunzip")
     def gunzip(self, source: str) -> str:
         """Unzip a gzip archive."""
         target = source + ".unzipped"
@@ -85,57 +267,190 @@ class GenericInstaller(GenericInstallBase):
         with gzip.open(source_path, "rb") as f_in:
             with open(target_path, "wb") as f_out:
                 shutil.copyfileobj(f_in, f_out)
+        self.index_files([target])
+        current_span().set(
+            source_bytes=os.path.getsize(source_path),
+            bytes=os.path.getsize(target_path),
+        )
         return target
 
+    @traced("unzip")
     def unzip(self, source: str):
         """Unzip a zip archive."""
         target_path = self.download_path
         source_path = os.path.join(self.download_path, source)
         print(f"unzipping {source_path} to {target_path}/")
-        zipfile.ZipFile(source_path).extractall(target_path)
+        current_span().set(source_bytes=os.path.getsize(source_path))
+        with zipfile.ZipFile(source_path) as archive:
+            archive.extractall(target_path)
+            self.index_files(i.filename for i in archive.infolist() if not i.is_dir())
 
+    @traced("untar")
     def untar(self, source: str):
         """Untar a tarball."""
         target_path = self.download_path
         source_path = os.path.join(self.download_path, source)
         print(f"untaring {source_path} to {target_path}/")
+        current_span().set(source_bytes=os.path.getsize(source_path))
         with tarfile.open(source_path) as f:
             f.extractall(path=target_path)
+            self.index_files(m.name for m in f.getmembers() if not m.isdir())
 
+    @traced("stream_install")
+    def stream_install(
+        self,
+        files: dict[str, str | re.Pattern | None],
+        source: str,
+    ) -> bool:
+        """
+        Install executable files from a zip or (gzip, bz2, xz or zstd
+        compressed) tar archive without extracting it to disk first.
+        Returns false if source isn't such an archive or a file named by
+        files wasn't found in it.
+        """
+        source_path = os.path.join(self.download_path, source)
+        current_span().set(source_bytes=os.path.getsize(source_path))
+        if zipfile.is_zipfile(source_path):
+            print(f"extracting {source_path}")
+            with zipfile.ZipFile(source_path) as archive:
+                return self.install_members(
+                    files,
+                    (
+                        (member_name(info.filename), lambda i=info: archive.open(i))
+                        for info in archive.infolist()
+                        if not info.is_dir()
+                    ),
+                )
+        with open(source_path, "rb") as fh:
+            stream = open_decompressed(fh)
+            if not is_tar(stream.peek(512)):
+                return False
+            print(f"extracting {source_path}")
+            return self.install_members(files, iter_tar_members(stream))
+
+    def install_members(
+        self,
+        files: dict[str, str | re.Pattern | None],
+        members: Iterable[tuple[str, Callable[[], BinaryIO]]],
+    ) -> bool:
+        """
+        Install the archive members selected by files, members being
+        (name, open) tuples of all files in the archive. A member matching
+        multiple patterns is installed by the first one.
+        Returns false if a file named by files isn't among the members.
+        """
+        named = {
+            target: member_name(self.template(source or target))
+            for target, source in files.items()
+            if not isinstance(source, re.Pattern)
+        }
+        missing = set(named)
+        for name, open_member in members:
+            targets = list()
+            matched = False
+            for target, source in files.items():
+                if isinstance(source, re.Pattern):
+                    if not matched and source.search(name):
+                        targets.append(source.sub(target, name))
+                        matched = True
+                elif named[target] == name:
+                    targets.append(self.template(target))
+                    missing.discard(target)
+            if targets:
+                with open_member() as fh:
+                    self.install_stream(fh, name, targets)
+        return not missing
+
+    def install_stream(self, stream: BinaryIO, name: str, targets: list[str]):
+        """Write an executable from stream to all targets in bin."""
+        with self.transaction():
+            first_path = None
+            for target in targets:
+                target_path = os.path.join(self.install_path, "bin", target)
+                print(f"installing {name} to {target_path}")
+                staged_path = self.stage_path(target)
+                if first_path is None:
+                    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                    with open(os.open(staged_path, flags, 0o755), "wb") as f_out:
+                        shutil.copyfileobj(stream, f_out, 1024 * 1024)
+                    first_path = staged_path
+                else:
+                    link_or_copy(first_path, staged_path)
+                current_span().add("files")
+                current_span().add("bytes", os.path.getsize(staged_path))
+
+    def index_files(self, names: Iterable[str]):
+        """
+        Add extracted archive members to the file index, so install_files
+        doesn't need to walk the download directory.
+        """
+        if self.file_index is None:
+            self.file_index = {
+                entry.name
+                for entry in os.scandir(self.download_path)
+                if entry.is_file()
+            }
+        self.file_index.update(member_name(name) for name in names)
+
+    def downloaded_files(self) -> list[str]:
+        """
+        Returns the paths of all files in the download directory relative
+        to it, from the file index or a single directory walk.
+        """
+        if self.file_index is None:
+            self.file_index = set()
+            for root, _, names in os.walk(self.download_path):
+                relative = os.path.relpath(root, self.download_path)
+                self.file_index.update(
+                    os.path.normpath(os.path.join(relative, name)) for name in names
+                )
+        return sorted(self.file_index)
+
+    @traced("install_files")
     def install_files(
         self,
         files: dict[str, str | re.Pattern | None],
         source_file: str,
     ):
         """Install executable files from download to install directory."""
-        for target, source in files.items():
-            if isinstance(source, re.Pattern):
-                dl_files_path = pathlib.Path(self.download_path)
-                dl_files = [
-                    str(item.relative_to(dl_files_path))
-                    for item in dl_files_path.rglob("*")
-                    if item.is_file()
-                ]
-                for dl_file in dl_files:
-                    if source.search(dl_file):
-                        target_name = source.sub(target, dl_file)
-                        self.install_file(dl_file, target_name)
-            else:
-                if source is None:
-                    source = source_file
-                    if os.path.isfile(os.path.join(self.download_path, target)):
-                        source = target
-                self.install_file(self.template(source), self.template(target))
+        with self.transaction():
+            for is_pattern, group in itertools.groupby(
+                files.items(), key=lambda item: isinstance(item[1], re.Pattern)
+            ):
+                if is_pattern:
+                    self.install_matching(list(group))
+                    continue
+                for target, source in group:
+                    if source is None:
+                        source = source_file
+                        if os.path.isfile(os.path.join(self.download_path, target)):
+                            source = target
+                    self.install_file(self.template(source), self.template(target))
+
+    def install_matching(self, patterns: list[tuple[str, re.Pattern]]):
+        """
+        Install the downloaded files matching any of the (target, source)
+        patterns in a single pass, a file matching multiple patterns is
+        installed by the first one.
+        """
+        combined = combine_patterns([source for _, source in patterns])
+        for dl_file in self.downloaded_files():
+            if combined is not None and not combined.search(dl_file):
+                continue
+            for target, source in patterns:
+                if source.search(dl_file):
+                    self.install_file(dl_file, source.sub(target, dl_file))
+                    break
 
     def install_file(self, source: str, target: str):
-        """Install a single executable from download to install directory."""
-        source_path = os.path.join(self.download_path, source)
-        target_path = os.path.join(self.install_path, "bin", target)
-        print(f"installing {source_path} to {target_path}")
-        dir_path = os.path.dirname(target_path)
-        if not os.path.isdir(dir_path):
-            os.mkdir(dir_path)
-        os.rename(source_path, target_path)
-        st = os.stat(target_path)
-        x_bits = stat.S_IXGRP | stat.S_IXUSR | stat.S_IXOTH
-        os.chmod(target_path, st.st_mode | x_bits)
+        """
+        Install a single executable from download to install directory,
+        it's placed by the enclosing transaction.
+        """
+        with self.transaction():
+            source_path = os.path.join(self.download_path, source)
+            target_path = os.path.join(self.install_path, "bin", target)
+            print(f"installing {source_path} to {target_path}")
+            self.stage_path(target, source_path)
+            if self.file_index is not None:
+                self.file_index.discard(os.path.normpath(source))
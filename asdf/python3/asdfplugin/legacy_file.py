@@ -0,0 +1,152 @@
+from .version_cache import VersionCache, asdf_data_dir, plugin_name
+import os
+from typing import Callable, Self
+
+
+def stamp_files(directory: str, suffix: str) -> list[list[any]]:
+    """Returns name, mtime & size of the files in directory ending with suffix."""
+    stamp = list()
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if entry.name.endswith(suffix) and entry.is_file():
+            st = entry.stat()
+            stamp.append([entry.name, st.st_mtime_ns, st.st_size])
+    return stamp
+
+
+class LegacyFiles(object):
+    """
+    LegacyFiles implements asdf's list-legacy-filenames & parse-legacy-file.
+    Both run on every call of a shim, so what they derive from version
+    files is cached, keyed by path, mtime & size of the files (and the
+    installed versions), a warm shim neither parses files nor asks upstream.
+
+    cache:
+    - VersionCache to store the results in, None disables caching
+    - default: VersionCache() unless disabled by ASDF_PLUGIN_CACHE=0
+
+    installs_path:
+    - the directory of the installed versions of the plugin
+    - default: $ASDF_DATA_DIR/installs/<plugin>
+    """
+
+    def __init__(self):
+        self.cache = VersionCache() if VersionCache.enabled() else None
+        self.installs_path = os.path.join(asdf_data_dir(), "installs", plugin_name())
+
+    def cached(self, parts: list[any], stamp: list[any], compute: Callable) -> any:
+        """
+        Returns the value cached under parts if it was computed for stamp,
+        otherwise stores & returns compute().
+        One entry per parts is kept, it's replaced as soon as stamp changes.
+        """
+        if self.cache is None:
+            return compute()
+        key = self.cache.key("legacy", *parts)
+        entry = self.cache.load(key)
+        if entry is not None and entry.get("stamp") == stamp:
+            return entry["value"]
+        value = compute()
+        self.cache.store(key, {"stamp": stamp, "value": value})
+        return value
+
+    def installed_versions(self) -> list[str]:
+        """Returns the installed versions, sorted to fingerprint them."""
+        try:
+            return sorted(os.listdir(self.installs_path))
+        except FileNotFoundError:
+            return []
+
+    def list_legacy_filenames(
+        self,
+        filenames: list[str],
+        suffix: str = "",
+        detect: Callable[[str], bool] | None = None,
+    ) -> Self:
+        """
+        Implements asdf's list-legacy-filenames functionality.
+
+        filenames:
+        - the version files which are always listed
+            (e.g. [".terraform-version"])
+
+        suffix & detect:
+        - files in the current directory ending with suffix are listed too,
+            if detect(path) returns true (e.g. .tf files containing a
+            required_version)
+
+        Returns self to allow chaining.
+        """
+        print(" ".join(self.get_legacy_filenames(filenames, suffix, detect)))
+        return self
+
+    def get_legacy_filenames(
+        self,
+        filenames: list[str],
+        suffix: str = "",
+        detect: Callable[[str], bool] | None = None,
+        directory: str = ".",
+    ) -> list[str]:
+        """Returns filenames and the files in directory detected as such."""
+        if detect is None:
+            return list(filenames)
+        stamp = stamp_files(directory, suffix)
+        detected = self.cached(
+            ["filenames", os.path.abspath(directory), suffix],
+            stamp,
+            lambda: [
+                name for name, _, _ in stamp if detect(os.path.join(directory, name))
+            ],
+        )
+        return [*filenames, *detected]
+
+    def parse_legacy_file(
+        self,
+        path: str,
+        resolve: Callable[[str, list[str]], str | None],
+        siblings: str = "",
+    ) -> Self:
+        """
+        Implements asdf's parse-legacy-file functionality.
+
+        resolve:
+        - called as resolve(path, installed versions), returns the version
+            to use or None
+        - only called if path or the installed versions changed
+
+        siblings:
+        - if resolve() reads all files ending with siblings in the
+            directory of path (e.g. ".tf" for terraform modules), changes
+            to any of them invalidate the cached version too
+
+        Returns self to allow chaining.
+        """
+        version = self.get_legacy_version(path, resolve, siblings)
+        if version is not None:
+            print(version)
+        return self
+
+    def get_legacy_version(
+        self,
+        path: str,
+        resolve: Callable[[str, list[str]], str | None],
+        siblings: str = "",
+    ) -> str | None:
+        """Returns the (cached) version resolve() derives from path."""
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size, self.installed_versions()]
+        if siblings:
+            stamp.append(stamp_files(os.path.dirname(path) or ".", siblings))
+        return self.cached(
+            ["version", os.path.abspath(path)],
+            stamp,
+            lambda: resolve(path, stamp[2]),
+        )
+
+    def modify(self, **kwargs: dict[str, any]) -> Self:
+        """
+        Modify multiple attributes of this object.
+        Returns self to allow chaining.
+        """
+        for k, v in kwargs.items():
+            self.__setattr__(k, v)
+        return self
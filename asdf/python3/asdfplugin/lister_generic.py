@@ -1,5 +1,107 @@
+from __future__ import annotations
 from .base_generic_list import GenericListBase
-import requests
+from .version_cache import NotModified
+import re
+import json
+import codecs
+from itertools import chain
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    import requests
+
+
+def iter_text(response: requests.Response, chunk_size: int) -> Iterator[str]:
+    """
+    Yields the body of response as text chunks while it is downloaded,
+    decoding multi-byte characters split across chunks correctly.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")("replace")
+    for chunk in response.iter_content(chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def iter_matches(
+    pattern: re.Pattern,
+    chunks: Iterable[str],
+    max_match_length: int,
+) -> Iterator[re.Match]:
+    r"""
+    Yields the matches of pattern like pattern.finditer() on the joined
+    chunks, while only keeping the current chunk & the up to
+    max_match_length long tail of the previous one in memory.
+    Matches close to the end of a chunk are only taken, once the next chunk
+    has shown they couldn't be any longer.
+    The search continues at an offset into the kept text instead of its
+    start, so anchors (^, \A, \b) & lookbehinds see the preceding text
+    and don't match at every chunk boundary.
+    """
+    buffer = ""
+    pos = 0
+    for chunk in chain(chunks, [None]):
+        final = chunk is None
+        if not final:
+            buffer += chunk
+        safe_end = len(buffer) - max_match_length
+        keep = pos
+        for match in pattern.finditer(buffer, pos):
+            if not final and match.end() > safe_end:
+                keep = match.start()
+                break
+            yield match
+            keep = match.end()
+        else:
+            keep = max(keep, safe_end)
+        # keep up to max_match_length characters before the search position
+        cut = max(0, keep - max_match_length)
+        buffer = buffer[cut:]
+        pos = keep - cut
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[any]:
+    """
+    Yields the items of a JSON array from text chunks one by one, so only
+    the current item and chunk need to be kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    for chunk in chain(chunks, [None]):
+        final = chunk is None
+        if not final:
+            buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break
+            # a number at the end of the buffer might continue
+            if end == len(buffer) and not final:
+                break
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+    raise ValueError("truncated JSON array")
 
 
 class GenericLister(GenericListBase):
@@ -9,26 +111,100 @@ class GenericLister(GenericListBase):
 
     url:
     - the url to query for versions
+
+    session:
+    - the requests.Session to use, shared by all listers & downloaders
+
+    chunk_size:
+    - the page is scanned while it is downloaded in chunks of this size
+    - default: 64 KiB
+
+    max_match_length:
+    - the longest match of the filter regex to expect, matches spanning
+        two chunks are found as long as they aren't longer than this
+    - default: 1024
     """
 
     def __init__(self, url: str):
+        super().__init__()
         self.url = url
+        self._session = None
         self.headers = None
         self.params = None
+        self.chunk_size = 64 * 1024
+        self.max_match_length = 1024
+
+    @property
+    def session(self) -> requests.Session:
+        """The requests.Session to use, the shared one is set up on first use."""
+        if self._session is None:
+            from .session import get_session
+
+            self._session = get_session()
+        return self._session
+
+    @session.setter
+    def session(self, session: requests.Session):
+        self._session = session
+
+    def cache_id(self) -> list[any]:
+        """Returns what identifies the upstream source of the versions."""
+        return [self.__class__.__name__, self.url, self.params]
+
+    def request(
+        self,
+        params: dict[str, any] | None,
+        revalidate: bool = False,
+    ) -> requests.Response:
+        """
+        HTTP request the url with given params.
+        With revalidate the request is made conditional on the cached
+        validators, raising NotModified on a 304 reply. Otherwise the
+        validators of the response are remembered for the cache.
+        """
+        headers = self.headers
+        if revalidate and self.validators:
+            headers = dict(headers or {})
+            if self.validators.get("etag"):
+                headers["If-None-Match"] = self.validators["etag"]
+            if self.validators.get("last_modified"):
+                headers["If-Modified-Since"] = self.validators["last_modified"]
+        response = self.session.get(
+            self.url, params=params, headers=headers, stream=True
+        )
+        if revalidate:
+            if response.status_code == 304:
+                response.close()
+                raise NotModified()
+            self.validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        return response
 
     def do_requests(self) -> list[requests.Response]:
         """HTTP request the version page."""
-        response = requests.get(self.url, params=self.params, headers=self.headers)
-        response.raise_for_status()
-        return [response]
+        return [self.request(self.params, revalidate=True)]
 
     def extract_versions(self, response: requests.Response) -> list[str]:
         """Extracts the relevant version strings from the response."""
-        return self.version_filter.findall(str(response.content))
+        group = 1 if self.version_filter.groups else 0
+        return [
+            match.group(group)
+            for match in iter_matches(
+                self.version_filter,
+                iter_text(response, self.chunk_size),
+                self.max_match_length,
+            )
+        ]
 
     def get_versions(self) -> list[str]:
         """Retrieves a list of all versions..."""
         versions = list()
         for response in self.do_requests():
-            versions.extend(self.extract_versions(response))
+            with response:
+                versions.extend(self.extract_versions(response))
         return versions
@@ -1,6 +1,26 @@
-from .lister_generic import GenericLister
+from __future__ import annotations
+from .lister_generic import GenericLister, iter_json_array, iter_text
+from .tracing import current_span, propagate
 import os
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable
+from urllib.parse import parse_qs, urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+graphql_releases_query = """
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    releases(first: 100, after: $cursor,
+             orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes { tagName isPrerelease isDraft }
+    }
+  }
+}
+"""
 
 
 class GithubLister(GenericLister):
@@ -13,11 +33,51 @@ class GithubLister(GenericLister):
     url:
     - the url to query for versions
     - default: https://api.github.com/repos/{repo}/releases
+
+    max_workers:
+    - number of pages to fetch concurrently, once the last page is known
+    - 1 walks the pages sequentially following rel="next"
+    - default: 8
+
+    incremental:
+    - remember the tags of all published releases & the versions seen in
+        the cache, later runs only fetch pages until they reach a known
+        release
+    - releases deleted upstream are only dropped by a full sync
+    - default: False
+
+    incremental_max_age:
+    - seconds after which incremental mode does a full sync again
+    - default: 7 days
+
+    backend:
+    - "rest" pages through the full release objects of the REST api
+    - "graphql" only fetches tag names & flags from the GraphQL api
+        (graphql_url), which needs GITHUB_API_TOKEN, without a token the
+        REST api is used
+    - incremental mode always uses the REST api
+    - default: "rest"
+
+    latest_endpoint:
+    - latest-stable without query also considers GitHub's latest release
+        (/releases/latest) if its tag passes the filter, so it answers
+        even if the first page has no matching release
+    - GitHub's latest release is the most recently published one, which
+        may be a patch of an older branch, so it is always compared with
+        the first page
+    - default: True
     """
 
     def __init__(self, repo: str):
         super().__init__(f"https://api.github.com/repos/{repo}/releases")
+        self.repo = repo
+        self.backend = "rest"
+        self.graphql_url = "https://api.github.com/graphql"
         self.params = {"per_page": 100, "page": 1}
+        self.max_workers = 8
+        self.incremental = False
+        self.incremental_max_age = 7 * 24 * 3600
+        self.latest_endpoint = True
         token = os.environ.get("GITHUB_API_TOKEN")
         if token:
             if self.headers is None:
@@ -28,29 +88,207 @@ class GithubLister(GenericLister):
         """Returns true if the response indicates there are more pages."""
         return 'rel="next"' in response.headers.get("Link", "")
 
+    def last_page(self, response: requests.Response) -> int | None:
+        """
+        Returns the page number of the rel="last" link of the response.
+        Returns None if the response doesn't announce a last page.
+        """
+        url = response.links.get("last", {}).get("url")
+        if url is None:
+            return None
+        pages = parse_qs(urlparse(url).query).get("page")
+        if not pages or not pages[0].isdigit():
+            return None
+        return int(pages[0])
+
+    def request_page(self, page: int, revalidate: bool = False) -> requests.Response:
+        """HTTP request a single page of the version page."""
+        return self.request({**self.params, "page": page}, revalidate)
+
     def do_requests(self) -> list[requests.Response]:
-        """HTTP request all pages of the version page."""
-        response_list = list()
-        while True:
-            response = requests.get(
-                self.url,
-                params=self.params,
-                headers=self.headers,
-            )
-            response.raise_for_status()
+        """
+        HTTP request all pages of the version page.
+        Only the first page is revalidated against the cache, as any new
+        release shows up on it.
+        """
+        response = self.request_page(self.params["page"], revalidate=True)
+        if self.max_workers > 1 and self.has_more_pages(response):
+            last_page = self.last_page(response)
+            if last_page is not None:
+                return [response, *self.request_pages(last_page)]
+        response_list = [response]
+        page = self.params["page"]
+        while self.has_more_pages(response):
+            # read the body, so its connection is free for the next page
+            response.content
+            page += 1
+            response = self.request_page(page)
             response_list.append(response)
-            if not self.has_more_pages(response):
-                break
-            self.params["page"] += 1
         return response_list
 
+    def request_pages(self, last_page: int) -> list[requests.Response]:
+        """
+        HTTP request the pages following the first one up to last_page
+        concurrently, keeping them in page order.
+        """
+        pages = range(self.params["page"] + 1, last_page + 1)
+
+        @propagate
+        def request_page(page: int) -> requests.Response:
+            response = self.request_page(page)
+            # download the body in the worker, not once all pages are back
+            response.content
+            return response
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(request_page, pages))
+
     def extract_versions(self, response: requests.Response) -> list[str]:
-        """Extracts the relevant version strings from the response."""
-        data = response.json()
+        """
+        Extracts the relevant version strings from the response, parsing
+        one release object at a time.
+        """
+        return self.versions_from_releases(
+            iter_json_array(iter_text(response, self.chunk_size))
+        )
+
+    def versions_from_releases(self, releases: Iterable[dict]) -> list[str]:
+        """Extracts the relevant version strings from release objects."""
         versions = list()
-        for item in data:
+        for item in releases:
             if not item["prerelease"] and not item["draft"]:
                 match = self.version_filter.search(item["tag_name"])
                 if match:
                     versions.append(match.group(1))
         return versions
+
+    def cache_id(self) -> list[any]:
+        """Returns what identifies the upstream source of the versions."""
+        return [*super().cache_id(), self.backend]
+
+    def find_latest(self, query: str = "") -> str | None:
+        """
+        Returns the latest version matching query without fetching all
+        pages: the latest match of the first page (newest releases first)
+        containing one. Without query GitHub's latest release (see
+        latest_endpoint) is compared with the first page only.
+        """
+        versions = list()
+        if not query and self.latest_endpoint:
+            latest = self.request_latest_release()
+            if latest is not None:
+                current_span().set(latest_release=latest)
+                versions.append(latest)
+        page = self.params["page"]
+        while True:
+            with self.request_page(page) as response:
+                versions.extend(self.extract_versions(response))
+            latest = self.latest_of(versions, query)
+            if latest is not None or not self.has_more_pages(response):
+                current_span().set(source="pages", pages=page)
+                return latest
+            page += 1
+
+    def request_latest_release(self) -> str | None:
+        """
+        Returns the version of GitHub's latest release.
+        Returns None if there is none or its tag doesn't pass the filter.
+        """
+        response = self.session.get(f"{self.url}/latest", headers=self.headers)
+        if response.status_code == 404:
+            response.close()
+            return None
+        response.raise_for_status()
+        versions = self.versions_from_releases([response.json()])
+        return versions[0] if versions else None
+
+    def get_versions(self) -> list[str]:
+        """Retrieves a list of all versions, incrementally if enabled."""
+        if self.incremental and self.cache is not None:
+            return self.get_versions_incremental()
+        if self.backend == "graphql" and "Authorization" in (self.headers or {}):
+            return self.versions_from_releases(self.request_graphql_releases())
+        return super().get_versions()
+
+    def request_graphql_releases(self) -> list[dict]:
+        """
+        Returns all releases from the GraphQL api, reduced to what
+        versions_from_releases() needs, in batches of 100.
+        """
+        owner, name = self.repo.split("/", 1)
+        variables = {"owner": owner, "name": name, "cursor": None}
+        releases = list()
+        while True:
+            response = self.session.post(
+                self.graphql_url,
+                json={"query": graphql_releases_query, "variables": variables},
+                headers=self.headers,
+            )
+            response.raise_for_status()
+            data = response.json()
+            if data.get("errors"):
+                raise ValueError(f"GraphQL error: {data['errors']}")
+            result = data["data"]["repository"]["releases"]
+            releases.extend(
+                {
+                    "tag_name": node["tagName"],
+                    "prerelease": node["isPrerelease"],
+                    "draft": node["isDraft"],
+                }
+                for node in result["nodes"]
+            )
+            if not result["pageInfo"]["hasNextPage"]:
+                return releases
+            variables["cursor"] = result["pageInfo"]["endCursor"]
+
+    def get_versions_incremental(self) -> list[str]:
+        """
+        Retrieves a list of all versions, fetching only the pages with
+        releases whose tags weren't published at the last sync.
+        """
+        filter = self.version_filter.pattern
+        key = self.cache.key("incremental", self.cache_id(), filter)
+        state = self.cache.load(key)
+        if (
+            state is None
+            or "tags" not in state
+            or time.time() - state["synced"] > self.incremental_max_age
+        ):
+            # a full sync must read all pages, not be answered by a 304
+            self.validators = None
+            releases = list()
+            for response in self.do_requests():
+                releases.extend(response.json())
+            state = {"synced": time.time(), "tags": []}
+            versions = self.versions_from_releases(releases)
+        else:
+            releases = self.request_new_releases(set(state["tags"]))
+            versions = state["versions"] + self.versions_from_releases(releases)
+        # drafts & prereleases are only known once they are published, an
+        # older draft published later keeps its (lower) id & position
+        tags = set(state["tags"])
+        tags.update(
+            item["tag_name"]
+            for item in releases
+            if not item["prerelease"] and not item["draft"]
+        )
+        versions = sorted(set(versions))
+        self.cache.store(key, {**state, "tags": sorted(tags), "versions": versions})
+        return versions
+
+    def request_new_releases(self, known_tags: set[str]) -> list[dict]:
+        """
+        Returns the releases whose tags aren't in known_tags, requesting
+        pages newest first until a page contains a known release.
+        """
+        releases = list()
+        page = self.params["page"]
+        response = self.request_page(page, revalidate=True)
+        while True:
+            data = response.json()
+            releases.extend(item for item in data if item["tag_name"] not in known_tags)
+            known = any(item["tag_name"] in known_tags for item in data)
+            if known or not self.has_more_pages(response):
+                return releases
+            page += 1
+            response = self.request_page(page)
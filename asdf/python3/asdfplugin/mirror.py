@@ -0,0 +1,197 @@
+import io
+import os
+import json
+import fcntl
+import email.utils
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib.parse import unquote, urlparse
+from urllib3.response import HTTPResponse
+
+
+def load_mirrors() -> dict[str, str]:
+    """
+    Returns the upstream prefix -> mirror mapping of $ASDF_PLUGIN_MIRRORS,
+    which is either a JSON object or the path of a JSON file containing it
+    (e.g. {"https://releases.hashicorp.com/": "file:///srv/mirror/"}).
+    """
+    config = os.environ.get("ASDF_PLUGIN_MIRRORS", "").strip()
+    if not config:
+        return {}
+    if not config.startswith("{"):
+        with open(config, "r") as fh:
+            config = fh.read()
+    return json.loads(config)
+
+
+def is_offline() -> bool:
+    """
+    Returns true if $ASDF_PLUGIN_OFFLINE forbids requests to upstream,
+    "", "0", "no", "off" & "false" keep requests enabled.
+    """
+    value = os.environ.get("ASDF_PLUGIN_OFFLINE", "0").lower()
+    return value not in ("", "0", "no", "off", "false")
+
+
+def update_index(root: str, entries: dict[str, str]):
+    """
+    Merge entries (upstream url -> path relative to root) into the
+    index.json of a mirror tree, safe against concurrent writers.
+    """
+    os.makedirs(root, exist_ok=True)
+    index_path = os.path.join(root, "index.json")
+    with open(os.path.join(root, ".lock"), "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        index = dict()
+        if os.path.isfile(index_path):
+            with open(index_path, "r") as fh:
+                index = json.load(fh)
+        index.update(entries)
+        with open(index_path + ".tmp", "w") as fh:
+            json.dump(index, fh, indent=1, sort_keys=True)
+        os.replace(index_path + ".tmp", index_path)
+
+
+class RangeReader(io.RawIOBase):
+    """RangeReader reads at most length bytes from stream."""
+
+    def __init__(self, stream, length: int):
+        self.stream = stream
+        self.remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.stream.read(min(len(buffer), self.remaining))
+        self.remaining -= len(data)
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+
+class MirrorAdapter(HTTPAdapter):
+    """
+    MirrorAdapter sends requests for urls starting with prefix to target
+    instead, which is either another http(s) url or a file:// tree.
+    Files of a file:// tree are found by the url's path below prefix, or
+    by the full url in the tree's index.json (e.g. for urls with query).
+    Files are served with Range, If-Range, ETag & If-None-Match support,
+    like a static web server would.
+    """
+
+    def __init__(self, prefix: str, target: str, **kwargs: dict[str, any]):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+        self.target = target
+        self._index = (None, {})
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if not request.url.startswith(self.prefix):
+            return super().send(request, **kwargs)
+        if self.target.startswith("file://"):
+            return self.send_file(request)
+        request.url = self.target + request.url[len(self.prefix) :]
+        return super().send(request, **kwargs)
+
+    @property
+    def root(self) -> str:
+        """The directory of a file:// target."""
+        return os.path.normpath(unquote(urlparse(self.target).path))
+
+    def index(self) -> dict[str, str]:
+        """Returns the index.json of the tree, reloaded when it changes."""
+        index_path = os.path.join(self.root, "index.json")
+        try:
+            mtime = os.stat(index_path).st_mtime_ns
+        except OSError:
+            return {}
+        if self._index[0] != mtime:
+            with open(index_path, "r") as fh:
+                self._index = (mtime, json.load(fh))
+        return self._index[1]
+
+    def file_path(self, url: str) -> str:
+        """Returns the path in the tree to serve url from."""
+        relative = self.index().get(url)
+        if relative is None:
+            relative = unquote(urlparse(url[len(self.prefix) :]).path)
+        path = os.path.normpath(os.path.join(self.root, relative.lstrip("/")))
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        return path
+
+    def send_file(self, request: requests.PreparedRequest) -> requests.Response:
+        """Serve a GET or HEAD request from the file:// tree."""
+        path = self.file_path(request.url)
+        headers = dict()
+        if request.method not in ("GET", "HEAD"):
+            return self.file_response(request, 405, headers)
+        inside = path.startswith(os.path.join(self.root, ""))
+        if not inside or not os.path.isfile(path):
+            return self.file_response(request, 404, headers)
+        st = os.stat(path)
+        size = st.st_size
+        etag = f'"{st.st_mtime_ns:x}-{size:x}"'
+        headers["ETag"] = etag
+        headers["Last-Modified"] = email.utils.formatdate(st.st_mtime, usegmt=True)
+        headers["Accept-Ranges"] = "bytes"
+        if request.headers.get("If-None-Match") == etag:
+            return self.file_response(request, 304, headers)
+        status, start, end = 200, 0, size - 1
+        ranges = request.headers.get("Range", "").removeprefix("bytes=")
+        if request.headers.get("If-Range", etag) not in (
+            etag,
+            headers["Last-Modified"],
+        ):
+            ranges = ""
+        if ranges:
+            first, _, last = ranges.partition("-")
+            if first.isdigit() and int(first) >= size:
+                headers["Content-Range"] = f"bytes */{size}"
+                return self.file_response(request, 416, headers)
+            if first.isdigit():
+                status, start = 206, int(first)
+                end = min(int(last), size - 1) if last.isdigit() else size - 1
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        if request.method == "HEAD":
+            return self.file_response(request, status, headers)
+        fh = open(path, "rb")
+        fh.seek(start)
+        body = io.BufferedReader(RangeReader(fh, end - start + 1))
+        return self.file_response(request, status, headers, body)
+
+    def file_response(
+        self,
+        request: requests.PreparedRequest,
+        status: int,
+        headers: dict[str, str],
+        body: io.IOBase | None = None,
+    ) -> requests.Response:
+        """Wrap a file (or no body) into a requests.Response."""
+        response = HTTPResponse(
+            body=body or io.BytesIO(),
+            headers=headers,
+            status=status,
+            preload_content=False,
+            decode_content=False,
+            request_method=request.method,
+            request_url=request.url,
+        )
+        return self.build_response(request, response)
+
+
+class OfflineAdapter(BaseAdapter):
+    """OfflineAdapter refuses all requests, as there is no network."""
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        raise requests.ConnectionError(
+            f"offline, no mirror for {request.url}", request=request
+        )
+
+    def close(self):
+        pass
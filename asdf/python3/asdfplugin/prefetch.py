@@ -0,0 +1,51 @@
+from .batch_install import BatchTool, run_script
+import os
+import sys
+import argparse
+import tempfile
+
+
+def prefetch(tool: BatchTool, path: str) -> str:
+    """
+    Run the plugin's download with $ASDF_PLUGIN_PREFETCH_PATH set, so it
+    fetches its file for all platforms & arches into path.
+    Returns the output of the download script.
+    """
+    with tempfile.TemporaryDirectory() as download_path:
+        env = {
+            **tool.env(),
+            "ASDF_DOWNLOAD_PATH": download_path,
+            "ASDF_PLUGIN_PREFETCH_PATH": os.path.abspath(path),
+        }
+        return run_script(tool.script("download"), env)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python3 -m asdfplugin.prefetch",
+        description=(
+            "Download the files of asdf plugins for all platforms & arches "
+            "into <path>/<plugin>/<version>/<platform>-<arch>/."
+        ),
+    )
+    parser.add_argument("path", help="root of the prefetched tree")
+    parser.add_argument("tools", nargs="+", help="name=version pairs")
+    args = parser.parse_args(argv)
+    failed = False
+    for arg in args.tools:
+        name, _, version = arg.partition("=")
+        tool = BatchTool(name, version)
+        if not os.path.isfile(tool.script("download")):
+            print(f"{name}: no plugin download script", file=sys.stderr)
+            failed = True
+            continue
+        try:
+            print(prefetch(tool, args.path), end="")
+        except RuntimeError as e:
+            print(f"{name} {version} failed:\n{e}", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+from .mirror import MirrorAdapter, OfflineAdapter, is_offline, load_mirrors
+from .tracing import record_response
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+
+class RateLimitRetry(Retry):
+    """
+    RateLimitRetry retries on 429 & 5xx with exponential backoff.
+    Besides Retry-After it respects GitHub's X-RateLimit-Reset header, but
+    never waits longer than max_wait seconds for a single retry.
+    A 403 is only retried when it is GitHub's primary rate limit
+    (X-RateLimit-Remaining: 0), any other 403 is returned as is.
+    """
+
+    max_wait = 60
+
+    def increment(self, method=None, url=None, response=None, **kwargs):
+        if (
+            response is not None
+            and response.status == 403
+            and response.headers.get("X-RateLimit-Remaining") != "0"
+        ):
+            # with raise_on_status=False urllib3 hands the response back
+            raise MaxRetryError(kwargs.get("_pool"), url, "403 Forbidden")
+        return super().increment(method, url, response=response, **kwargs)
+
+    def get_retry_after(self, response) -> float | None:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None and response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = response.headers.get("X-RateLimit-Reset", "")
+            if reset.isdigit():
+                retry_after = max(0.0, int(reset) - time.time())
+        if retry_after is not None:
+            retry_after = min(retry_after, self.max_wait)
+        return retry_after
+
+
+def new_session(
+    pool_size: int | None = None,
+    retries: int | None = None,
+    backoff: float | None = None,
+    mirrors: dict[str, str] | None = None,
+    offline: bool | None = None,
+) -> requests.Session:
+    """
+    Create a requests.Session with keep-alive connection pools and retries.
+
+    pool_size:
+    - connections kept alive per host
+    - default: $ASDF_PLUGIN_POOL_SIZE or 10
+
+    retries:
+    - retries on connection errors, 429, 5xx & rate limited 403 responses
+    - default: $ASDF_PLUGIN_RETRIES or 3
+
+    backoff:
+    - backoff factor for the exponential backoff between retries
+    - default: $ASDF_PLUGIN_BACKOFF or 0.5
+
+    mirrors:
+    - upstream url prefix -> mirror url (http(s):// or file://), requests
+        to upstream are sent to the mirror instead (see MirrorAdapter)
+    - default: $ASDF_PLUGIN_MIRRORS (a JSON object or a JSON file)
+
+    offline:
+    - refuse all requests which don't go to a mirror, listers fall back
+        to their cached versions then
+    - default: $ASDF_PLUGIN_OFFLINE or false
+    """
+    if pool_size is None:
+        pool_size = int(os.environ.get("ASDF_PLUGIN_POOL_SIZE", "10"))
+    if retries is None:
+        retries = int(os.environ.get("ASDF_PLUGIN_RETRIES", "3"))
+    if backoff is None:
+        backoff = float(os.environ.get("ASDF_PLUGIN_BACKOFF", "0.5"))
+    if mirrors is None:
+        mirrors = load_mirrors()
+    if offline is None:
+        offline = is_offline()
+    retry = RateLimitRetry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(403, 429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    pool = {
+        "pool_connections": pool_size,
+        "pool_maxsize": pool_size,
+        "max_retries": retry,
+    }
+    adapter = OfflineAdapter() if offline else HTTPAdapter(**pool)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # requests picks the adapter with the longest matching prefix
+    for prefix, target in mirrors.items():
+        session.mount(prefix, MirrorAdapter(prefix, target, **pool))
+    session.hooks["response"].append(record_response)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Returns the session shared by all listers and downloaders."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = new_session()
+    return _session
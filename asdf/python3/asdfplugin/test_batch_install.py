@@ -0,0 +1,98 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import batch_install  # noqa: E402
+
+LIST_ALL = """
+print("1.0.0 1.1.0 2.0.0 2.1.0")
+"""
+
+DOWNLOAD = """
+import os
+from asdfplugin.environment import environ
+
+env = environ()
+with open(os.path.join(env["ASDF_DOWNLOAD_PATH"], "downloaded.file"), "w") as fh:
+    fh.write(env["ASDF_INSTALL_VERSION"])
+"""
+
+INSTALL = """
+import asdfplugin
+
+asdfplugin.GenericInstaller().install({"tool": None})
+"""
+
+
+class Test_BatchInstall(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for plugin in ("tool", "other"):
+            bin_path = os.path.join(self.tmp.name, "plugins", plugin, "bin")
+            os.makedirs(bin_path)
+            for name, script in (
+                ("list-all", LIST_ALL),
+                ("download", DOWNLOAD),
+                ("install", INSTALL),
+            ):
+                with open(os.path.join(bin_path, name), "w") as fh:
+                    fh.write(script)
+        patcher = mock.patch.dict(os.environ, {"ASDF_DATA_DIR": self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def installed(self, plugin: str, version: str) -> str:
+        path = os.path.join(self.tmp.name, "installs", plugin, version, "bin", "tool")
+        with open(path, "r") as fh:
+            return fh.read()
+
+    def test_parse_tool_versions(self):
+        tools = batch_install.parse_tool_versions(
+            io.StringIO(
+                "# comment\n"
+                "terraform 1.10.5 1.9.0\n"
+                "\n"
+                "kubectl latest # inline comment\n"
+                "python system\n"
+                "golang ref:abc\n"
+            )
+        )
+        self.assertEqual(
+            [(t.name, t.version) for t in tools],
+            [("terraform", "1.10.5"), ("kubectl", "latest")],
+        )
+
+    def test_install(self):
+        tools = [
+            batch_install.BatchTool("tool", "latest:1"),
+            batch_install.BatchTool("other", "2.0.0"),
+            batch_install.BatchTool("missing", "1.0.0"),
+        ]
+        installer = batch_install.BatchInstaller(2, 2)
+        self.assertFalse(installer.install(tools))
+        self.assertEqual(
+            [(t.version, t.status) for t in tools],
+            [("1.1.0", "ok"), ("2.0.0", "ok"), ("1.0.0", "no plugin")],
+        )
+        self.assertEqual(self.installed("tool", "1.1.0"), "1.1.0")
+        self.assertEqual(self.installed("other", "2.0.0"), "2.0.0")
+        summary = installer.summary(tools).splitlines()
+        self.assertEqual(
+            summary[0].split(),
+            ["tool", "version", "resolve", "download", "install", "status"],
+        )
+        self.assertEqual(len(summary), 4)
+        tools = [batch_install.BatchTool("tool", "latest:1")]
+        self.assertTrue(installer.install(tools))
+        self.assertEqual(tools[0].status, "installed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import io
+import os
+import sys
+import socketserver
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import daemon  # noqa: E402
+
+SCRIPT = """
+import os
+import sys
+
+print(" ".join(sys.argv[1:]), os.environ["TEST_VALUE"], os.getcwd())
+print("warning", file=sys.stderr)
+sys.exit(int(os.environ.get("TEST_EXIT", "0")))
+"""
+
+
+class Test_Daemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "daemon.sock")
+        self.server = daemon.Daemon(self.socket_path)
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        self.script = os.path.join(self.tmp.name, "plugins", "tool", "bin", "list-all")
+        os.makedirs(os.path.dirname(self.script))
+        with open(self.script, "w") as fh:
+            fh.write(SCRIPT)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def delegate(self, env: dict[str, str]) -> tuple[int, str, str]:
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with (
+            mock.patch.dict(os.environ, {"ASDF_DATA_DIR": self.tmp.name, **env}),
+            mock.patch.object(sys, "argv", [self.script, "a", "b"]),
+            mock.patch.object(sys, "stdout", stdout),
+            mock.patch.object(sys, "stderr", stderr),
+            self.assertRaises(SystemExit) as e,
+        ):
+            daemon.delegate(self.socket_path)
+        return e.exception.code, stdout.getvalue(), stderr.getvalue()
+
+    def test_delegate(self):
+        code, stdout, stderr = self.delegate({"TEST_VALUE": "x"})
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout, f"a b x {os.getcwd()}\n")
+        self.assertEqual(stderr, "warning\n")
+
+    def test_delegate_exit_code(self):
+        code, _, _ = self.delegate({"TEST_VALUE": "x", "TEST_EXIT": "3"})
+        self.assertEqual(code, 3)
+
+    def test_delegate_error(self):
+        code, _, stderr = self.delegate({})
+        self.assertEqual(code, 1)
+        self.assertIn("KeyError", stderr)
+
+    def test_delegate_isolated(self):
+        cwd = os.getcwd()
+        self.delegate({"TEST_VALUE": "x"})
+        self.assertNotIn("TEST_VALUE", os.environ)
+        self.assertEqual(os.getcwd(), cwd)
+
+    def test_not_a_plugin_script(self):
+        script = os.path.join(self.tmp.name, "bin", "list-all")
+        with (
+            mock.patch.dict(os.environ, {"ASDF_DATA_DIR": self.tmp.name}),
+            mock.patch.object(sys, "argv", [script]),
+        ):
+            self.assertIsNone(daemon.delegate(self.socket_path))
+
+    def test_no_daemon(self):
+        with (
+            mock.patch.dict(os.environ, {"ASDF_DATA_DIR": self.tmp.name}),
+            mock.patch.object(sys, "argv", [self.script]),
+        ):
+            missing = os.path.join(self.tmp.name, "missing")
+            self.assertIsNone(daemon.delegate(missing))
+
+    def test_daemon_closes_without_answer(self):
+        class ClosingHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.rfile.readline()
+
+        socket_path = os.path.join(self.tmp.name, "closing.sock")
+        server = socketserver.UnixStreamServer(socket_path, ClosingHandler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with (
+            mock.patch.dict(os.environ, {"ASDF_DATA_DIR": self.tmp.name}),
+            mock.patch.object(sys, "argv", [self.script]),
+        ):
+            self.assertIsNone(daemon.delegate(socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,489 @@
+import io
+import os
+import sys
+import re
+import json
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import artifact_cache, downloader_generic  # noqa: E402
+
+CONTENT = bytes(range(256)) * 4099
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+def make_zip() -> bytes:
+    # written to a non seekable stream, so members have data descriptors
+    class Unseekable(io.RawIOBase):
+        data = bytearray()
+
+        def writable(self):
+            return True
+
+        def write(self, b):
+            self.data += b
+            return len(b)
+
+    stream = Unseekable()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("LICENSE", b"license")
+        archive.writestr("tool", CONTENT)
+    return bytes(stream.data)
+
+
+def make_tar_gz() -> bytes:
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as tar:
+        for name, content in (("./README", b"readme"), ("./bin/tool", CONTENT)):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return data.getvalue()
+
+
+def make_corrupt_zip() -> bytes:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("tool", CONTENT)
+    data = bytearray(data.getvalue())
+    data[data.index(CONTENT[:256]) + 1000] ^= 0xFF
+    return bytes(data)
+
+
+ARCHIVES = {
+    "/archive.zip": make_zip(),
+    "/archive.tar.gz": make_tar_gz(),
+    "/corrupt.zip": make_corrupt_zip(),
+}
+
+
+class FakeFileHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.endswith("SHA256SUMS"):
+            body = f"{'0' * 64}  other.zip\n{self.server.digest}  tool.zip\n"
+            body += f"{self.server.archive_digest}  archive.zip\n"
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body.encode())
+            return
+        if self.path in ARCHIVES:
+            self.server.archives.append(self.path)
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(ARCHIVES[self.path])
+            return
+        self.server.requests.append(self.headers.get("Range"))
+        match = re.match(r"^bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+        if self.headers.get("If-Range", self.server.etag) != self.server.etag:
+            match = None
+        if self.server.no_ranges and self.headers.get("Range") != "bytes=0-0":
+            match = None
+        if match is None:
+            self.send_response(200)
+            self.send_header("ETag", self.server.etag)
+            self.send_header("Content-Length", str(len(CONTENT)))
+            self.end_headers()
+            self.wfile.write(CONTENT)
+            return
+        start = int(match.group(1))
+        end = int(match.group(2) or len(CONTENT) - 1)
+        if start >= len(CONTENT):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(CONTENT)}")
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENT)}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(CONTENT[start : end + 1])
+
+    def do_HEAD(self):
+        self.server.heads.append(self.path)
+        if "windows" in self.path:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(CONTENT)))
+        self.send_header("ETag", self.server.etag)
+        self.end_headers()
+
+
+class Test_GenericDownloader(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFileHandler)
+        self.server.requests = []
+        self.server.heads = []
+        self.server.archives = []
+        self.server.etag = '"v1"'
+        self.server.no_ranges = False
+        self.server.digest = DIGEST
+        self.server.archive_digest = hashlib.sha256(
+            ARCHIVES["/archive.zip"]
+        ).hexdigest()
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {
+            "ASDF_DOWNLOAD_PATH": self.tmp.name,
+            "ASDF_INSTALL_PATH": self.tmp.name,
+            "ASDF_INSTALL_VERSION": "1.2.3",
+            "ASDF_INSTALL_TYPE": "version",
+        }
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        stdout_patcher = mock.patch("sys.stdout", new_callable=io.StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def target(self, name="downloaded.file"):
+        with open(os.path.join(self.tmp.name, name), "rb") as fh:
+            return fh.read()
+
+    def test_download(self):
+        downloader_generic.GenericDownloader(self.url).download("tool-{version}")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(self.server.requests, [None])
+        self.assertEqual(os.listdir(self.tmp.name), ["downloaded.file"])
+
+    def test_resume(self):
+        with open(os.path.join(self.tmp.name, "downloaded.file.part"), "wb") as fh:
+            fh.write(CONTENT[:1000])
+        downloader_generic.GenericDownloader(self.url).download("tool")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(self.server.requests, ["bytes=1000-"])
+
+    def test_resume_if_range(self):
+        downloader = downloader_generic.GenericDownloader(self.url)
+        part = os.path.join(self.tmp.name, "downloaded.file.part")
+        with open(part, "wb") as fh:
+            fh.write(b"x" * 1000)
+        with open(part + ".validator", "w") as fh:
+            fh.write('"v0"')
+        downloader.download("tool")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(self.server.requests, ["bytes=1000-"])
+        self.assertEqual(os.listdir(self.tmp.name), ["downloaded.file"])
+
+    def test_resume_complete(self):
+        with open(os.path.join(self.tmp.name, "downloaded.file.part"), "wb") as fh:
+            fh.write(CONTENT)
+        downloader_generic.GenericDownloader(self.url).download("tool")
+        self.assertEqual(self.target(), CONTENT)
+
+    def test_parallel(self):
+        downloader_generic.GenericDownloader(self.url).modify(
+            parallel_parts=4,
+            parallel_min_size=1,
+            chunk_size=4096,
+        ).download("tool")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_parallel_failure(self):
+        self.server.no_ranges = True
+        # the client hangs up on the unexpected full responses
+        self.server.handle_error = lambda request, client_address: None
+        downloader = downloader_generic.GenericDownloader(self.url).modify(
+            parallel_parts=4,
+            parallel_min_size=1,
+        )
+        with self.assertRaises(ValueError):
+            downloader.download("tool")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_parallel_small_file(self):
+        downloader_generic.GenericDownloader(self.url).modify(
+            parallel_parts=4,
+        ).download("tool")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(self.server.requests, ["bytes=0-0", None])
+
+    def test_checksum(self):
+        downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        ).download("tool.zip")
+        self.assertEqual(self.target(), CONTENT)
+
+    def test_checksum_resume(self):
+        with open(os.path.join(self.tmp.name, "downloaded.file.part"), "wb") as fh:
+            fh.write(CONTENT[:1000])
+        downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        ).download("tool.zip")
+        self.assertEqual(self.target(), CONTENT)
+
+    def test_checksum_parallel(self):
+        downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+            parallel_parts=3,
+            parallel_min_size=1,
+        ).download("tool.zip")
+        self.assertEqual(self.target(), CONTENT)
+
+    def test_checksum_mismatch(self):
+        self.server.digest = "f" * 64
+        downloader = downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        )
+        with self.assertRaises(ValueError):
+            downloader.download("tool.zip")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_checksum_missing(self):
+        downloader = downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        )
+        with self.assertRaises(ValueError):
+            downloader.download("unknown.zip")
+
+    def test_checksum_skip_download(self):
+        with open(os.path.join(self.tmp.name, "downloaded.file"), "wb") as fh:
+            fh.write(CONTENT)
+        downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        ).download("tool.zip")
+        self.assertEqual(self.server.requests, [])
+
+    def test_parse_checksums(self):
+        parse = downloader_generic.parse_checksums
+        self.assertEqual(parse("ABC123\n", "tool"), "abc123")
+        self.assertEqual(parse("abc  tool\ndef  other\n", "other"), "def")
+        self.assertEqual(parse("abc *./dist/tool\n", "tool"), "abc")
+        self.assertEqual(parse("SHA256 (tool) = abc\n", "tool"), "abc")
+        self.assertIsNone(parse("abc  tool\ndef  other\n", "missing"))
+
+    def test_artifact_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = artifact_cache.ArtifactCache(cache_dir)
+            downloader_generic.GenericDownloader(self.url).modify(
+                artifact_cache=cache,
+            ).download("tool.zip")
+            os.remove(os.path.join(self.tmp.name, "downloaded.file"))
+            downloader_generic.GenericDownloader(self.url).modify(
+                artifact_cache=cache,
+            ).download("tool.zip", "other.file")
+            self.assertEqual(self.target("other.file"), CONTENT)
+            self.assertEqual(self.server.requests, [None])
+
+    def test_artifact_cache_copies(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = artifact_cache.ArtifactCache(cache_dir)
+            downloader_generic.GenericDownloader(self.url).modify(
+                artifact_cache=cache,
+            ).download("tool.zip")
+            target_path = os.path.join(self.tmp.name, "downloaded.file")
+            entry_path = cache.entry_path(f"{self.url}/tool.zip", None)
+            self.assertFalse(os.path.samefile(target_path, entry_path))
+            os.chmod(target_path, 0o755)
+            self.assertFalse(os.stat(entry_path).st_mode & 0o111)
+
+    def test_artifact_cache_evict_skips_temporary(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = artifact_cache.ArtifactCache(cache_dir, 0)
+            objects = os.path.join(cache_dir, "objects", "00")
+            os.makedirs(objects)
+            with open(os.path.join(objects, ".tmp-store"), "wb") as fh:
+                fh.write(CONTENT)
+            real_stat = os.stat
+
+            def vanishing_stat(path, *args, **kwargs):
+                if path.endswith("vanished"):
+                    raise FileNotFoundError(path)
+                return real_stat(path, *args, **kwargs)
+
+            open(os.path.join(objects, "vanished"), "wb").close()
+            with mock.patch("os.stat", vanishing_stat):
+                cache.evict()
+            self.assertEqual(sorted(os.listdir(objects)), [".tmp-store", "vanished"])
+
+    def test_artifact_cache_keyed_by_digest(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = artifact_cache.ArtifactCache(cache_dir)
+            downloader_generic.GenericDownloader(self.url).modify(
+                artifact_cache=cache,
+            ).download("tool.zip")
+            os.remove(os.path.join(self.tmp.name, "downloaded.file"))
+            downloader_generic.GenericDownloader(self.url).modify(
+                artifact_cache=cache,
+                checksum_file="SHA256SUMS",
+            ).download("tool.zip")
+            self.assertEqual(self.server.requests, [None, None])
+
+    def test_artifact_cache_evict(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = artifact_cache.ArtifactCache(cache_dir, len(CONTENT) * 2)
+            for i, name in enumerate(("a", "b", "c")):
+                downloader_generic.GenericDownloader(self.url).modify(
+                    artifact_cache=cache,
+                ).download(name, name)
+                os.utime(cache.entry_path(f"{self.url}/{name}", None), (i, i))
+            self.assertFalse(os.path.isfile(cache.entry_path(f"{self.url}/a", None)))
+            self.assertTrue(os.path.isfile(cache.entry_path(f"{self.url}/c", None)))
+
+    def test_download_member_zip(self):
+        downloader_generic.GenericDownloader(self.url).download_member(
+            "archive.zip", "tool"
+        )
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(os.listdir(self.tmp.name), ["downloaded.file"])
+
+    def test_download_member_keep_archive(self):
+        downloader_generic.GenericDownloader(self.url).modify(
+            keep_archive=True,
+        ).download_member("archive.zip", "tool")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(self.target("archive.zip"), ARCHIVES["/archive.zip"])
+
+    def test_download_member_tar_gz(self):
+        downloader_generic.GenericDownloader(self.url).download_member(
+            "archive.tar.gz", "bin/tool", "tool"
+        )
+        self.assertEqual(self.target("tool"), CONTENT)
+
+    def test_download_member_checksum(self):
+        downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        ).download_member("archive.zip", "tool")
+        self.assertEqual(self.target(), CONTENT)
+
+    def test_download_member_checksum_missing(self):
+        downloader = downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        )
+        with self.assertRaises(ValueError):
+            downloader.download_member("archive.tar.gz", "bin/tool")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_download_member_checksum_mismatch(self):
+        self.server.archive_digest = "f" * 64
+        downloader = downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+        )
+        with self.assertRaises(ValueError):
+            downloader.download_member("archive.zip", "tool")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_download_member_missing(self):
+        downloader = downloader_generic.GenericDownloader(self.url)
+        with self.assertRaises(FileNotFoundError):
+            downloader.download_member("archive.zip", "other")
+
+    def test_download_member_crc_mismatch(self):
+        downloader = downloader_generic.GenericDownloader(self.url)
+        with self.assertRaisesRegex(ValueError, "crc32"):
+            downloader.download_member("corrupt.zip", "tool")
+        self.assertNotIn("downloaded.file", os.listdir(self.tmp.name))
+
+    def test_download_member_present(self):
+        downloader = downloader_generic.GenericDownloader(self.url).modify(
+            checksum_file="SHA256SUMS",
+            keep_archive=True,
+        )
+        downloader.download_member("archive.zip", "tool")
+        os.remove(os.path.join(self.tmp.name, "downloaded.file"))
+        downloader.download_member("archive.zip", "tool")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(self.server.archives, ["/archive.zip"])
+
+    def test_download_member_resume(self):
+        with open(os.path.join(self.tmp.name, "archive.zip.part"), "wb") as fh:
+            fh.write(ARCHIVES["/archive.zip"][:1000])
+        downloader_generic.GenericDownloader(self.url).modify(
+            keep_archive=True,
+        ).download_member("archive.zip", "tool")
+        self.assertEqual(self.target(), CONTENT)
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)), ["archive.zip", "downloaded.file"]
+        )
+
+    def test_download_member_artifact_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = artifact_cache.ArtifactCache(cache_dir)
+            for target in ("downloaded.file", "other.file"):
+                downloader_generic.GenericDownloader(self.url).modify(
+                    artifact_cache=cache,
+                ).download_member("archive.zip", "tool", target)
+            self.assertEqual(self.target("other.file"), CONTENT)
+            self.assertEqual(self.server.archives, ["/archive.zip"])
+            self.assertEqual(
+                sorted(os.listdir(self.tmp.name)), ["downloaded.file", "other.file"]
+            )
+
+    def prefetch(self):
+        return downloader_generic.GenericDownloader(
+            self.url + "/prefetch/{platform}/{arch}"
+        ).modify(
+            prefetch_path=os.path.join(self.tmp.name, "mirror"),
+            checksum_file="SHA256SUMS",
+        )
+
+    def test_prefetch_targets(self):
+        targets = self.prefetch().modify(arch_386_value="amd64").prefetch_targets()
+        self.assertEqual(len(targets), 12)
+        self.assertIn(("darwin", "arm64"), targets)
+        self.assertIn(("windows", "s390x"), targets)
+
+    def test_prefetch(self):
+        self.server.digest = DIGEST
+        self.prefetch().download("tool.zip")
+        root = os.path.join(self.tmp.name, "mirror", "default", "1.2.3")
+        self.assertEqual(
+            sorted(os.listdir(root)),
+            sorted(
+                f"{pf}-{arch}"
+                for pf in ("linux", "darwin")
+                for arch in ("amd64", "arm64", "386", "ppc64le", "s390x")
+            ),
+        )
+        with open(os.path.join(root, "darwin-arm64", "tool.zip"), "rb") as fh:
+            self.assertEqual(fh.read(), CONTENT)
+        self.assertEqual(len(self.server.heads), 15)
+        with open(os.path.join(self.tmp.name, "mirror", "index.json")) as fh:
+            index = json.load(fh)
+        self.assertEqual(
+            index[self.url + "/prefetch/linux/386/tool.zip"],
+            os.path.join("default", "1.2.3", "linux-386", "tool.zip"),
+        )
+        self.assertEqual(self.server.requests, [None] * 10)
+        # present & confirmed by ETag
+        self.prefetch().download_member("tool.zip", "tool")
+        self.assertEqual(self.server.requests, [None] * 10)
+        self.server.etag = '"v2"'
+        self.prefetch().download("tool.zip")
+        self.assertEqual(self.server.requests, [None] * 20)
+        self.assertNotIn("downloaded.file", os.listdir(self.tmp.name))
+
+    def test_prefetch_resume(self):
+        part = os.path.join(
+            self.tmp.name, "mirror", "default", "1.2.3", "linux-amd64", "tool.zip"
+        )
+        part += ".part"
+        os.makedirs(os.path.dirname(part))
+        with open(part, "wb") as fh:
+            fh.write(CONTENT[:1000])
+        self.prefetch().download("tool.zip")
+        self.assertIn("bytes=1000-", self.server.requests)
+
+
+if __name__ == "__main__":
+    unittest.main()
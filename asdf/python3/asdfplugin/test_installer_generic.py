@@ -0,0 +1,236 @@
+import os
+import io
+import re
+import sys
+import errno
+import tarfile
+import platform
+import zipfile
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import installer_generic  # noqa: E402
+
+MEMBERS = {
+    "README.md": b"readme",
+    "linux-amd64/helm": b"helm binary",
+    "jsonnet": b"jsonnet binary",
+    "jsonnetfmt": b"jsonnetfmt binary",
+}
+
+
+def write_tar(path: str, mode: str):
+    with tarfile.open(path, mode) as tar:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(f"./{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def write_zip(path: str):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in MEMBERS.items():
+            archive.writestr(name, data)
+
+
+class Test_GenericInstaller(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.download_path = os.path.join(self.tmp.name, "download")
+        self.install_path = os.path.join(self.tmp.name, "install")
+        os.mkdir(self.download_path)
+        os.mkdir(self.install_path)
+        env = {
+            "ASDF_DOWNLOAD_PATH": self.download_path,
+            "ASDF_INSTALL_PATH": self.install_path,
+            "ASDF_INSTALL_VERSION": "1.2.3",
+            "ASDF_INSTALL_TYPE": "version",
+        }
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        stdout_patcher = mock.patch("sys.stdout", new_callable=io.StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+        self.archive = os.path.join(self.download_path, "downloaded.file")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def installer(self, **kwargs):
+        return installer_generic.GenericInstaller().modify(
+            **{"uname": platform.uname_result("Linux", "", "", "", "x86_64"), **kwargs}
+        )
+
+    def installed(self) -> dict[str, bytes]:
+        bin_path = os.path.join(self.install_path, "bin")
+        result = dict()
+        for name in sorted(os.listdir(bin_path)):
+            path = os.path.join(bin_path, name)
+            self.assertTrue(os.access(path, os.X_OK))
+            with open(path, "rb") as fh:
+                result[name] = fh.read()
+        return result
+
+    def assert_installs(self, stream_extract: bool):
+        self.installer(stream_extract=stream_extract).install(
+            {
+                "helm": "{platform}-{arch}/helm",
+                r"\1": re.compile(r"^(jsonnet.*)$"),
+                # members matching both patterns are installed by the first
+                r"x-\1": re.compile(r"^(json.*)$"),
+            }
+        )
+        self.assertEqual(
+            self.installed(),
+            {
+                "helm": b"helm binary",
+                "jsonnet": b"jsonnet binary",
+                "jsonnetfmt": b"jsonnetfmt binary",
+            },
+        )
+
+    def test_tar_gz(self):
+        write_tar(self.archive, "w:gz")
+        self.assert_installs(stream_extract=True)
+        self.assertEqual(os.listdir(self.download_path), ["downloaded.file"])
+
+    def test_tar_xz(self):
+        write_tar(self.archive, "w:xz")
+        self.assert_installs(stream_extract=True)
+        self.assertEqual(os.listdir(self.download_path), ["downloaded.file"])
+
+    def test_tar_bz2(self):
+        write_tar(self.archive, "w:bz2")
+        self.assert_installs(stream_extract=True)
+
+    def test_zip(self):
+        write_zip(self.archive)
+        self.assert_installs(stream_extract=True)
+        self.assertEqual(os.listdir(self.download_path), ["downloaded.file"])
+
+    def test_full_extraction(self):
+        write_tar(self.archive, "w:gz")
+        self.assert_installs(stream_extract=False)
+
+    def test_full_extraction_uses_member_index(self):
+        writers = (
+            lambda: write_tar(self.archive, "w:gz"),
+            lambda: write_zip(self.archive),
+        )
+        for write in writers:
+            with self.subTest(write=write):
+                write()
+                with mock.patch("os.walk", side_effect=AssertionError("walked")):
+                    self.assert_installs(stream_extract=False)
+
+    def test_install_files_patterns(self):
+        os.makedirs(os.path.join(self.download_path, "bin"))
+        for name in ("bin/tool", "bin/tool-helper", "bin/other", "README"):
+            with open(os.path.join(self.download_path, name), "w") as fh:
+                fh.write(name)
+        installer = self.installer()
+        installer.install_files(
+            {
+                r"\1": re.compile(r"^bin/(tool.*)$"),
+                r"x-\1": re.compile(r"^bin/(.*)$"),
+            },
+            "downloaded.file",
+        )
+        self.assertEqual(
+            self.installed(),
+            {
+                "tool": b"bin/tool",
+                "tool-helper": b"bin/tool-helper",
+                "x-other": b"bin/other",
+            },
+        )
+        self.assertEqual(installer.downloaded_files(), ["README"])
+
+    def test_combine_patterns(self):
+        combined = installer_generic.combine_patterns(
+            [re.compile(r"^(jsonnet.*)$"), re.compile(r"^bin/(\w+)$")]
+        )
+        self.assertTrue(combined.search("bin/tool"))
+        self.assertTrue(combined.search("jsonnetfmt"))
+        self.assertFalse(combined.search("README.md"))
+        for patterns in (
+            [re.compile("a")],
+            [re.compile("a"), re.compile("b", re.I)],
+            [re.compile(r"(a)\1"), re.compile("b")],
+            [re.compile("(?P<x>a)"), re.compile("(?P<x>b)")],
+        ):
+            self.assertIsNone(installer_generic.combine_patterns(patterns))
+
+    def test_missing_member_falls_back(self):
+        write_tar(self.archive, "w:gz")
+        self.installer().install({"tool": None})
+        self.assertEqual(list(self.installed()), ["tool"])
+
+    def test_plain_binary(self):
+        with open(self.archive, "wb") as fh:
+            fh.write(b"plain binary")
+        self.installer().install({"tool": None})
+        self.assertEqual(self.installed(), {"tool": b"plain binary"})
+
+    def write_downloads(self, *names: str):
+        for name in names:
+            with open(os.path.join(self.download_path, name), "w") as fh:
+                fh.write(name)
+
+    def test_failed_install_leaves_bin_untouched(self):
+        os.makedirs(os.path.join(self.install_path, "bin"))
+        self.write_downloads("tool", "tool-helper")
+        self.installer().install_files({"tool": None}, "downloaded.file")
+        installer_class = installer_generic.GenericInstaller
+        place = installer_class.place
+
+        def fail_helper(installer, source_path, staged_path):
+            if source_path.endswith("helper"):
+                raise OSError("disk full")
+            place(installer, source_path, staged_path)
+
+        self.write_downloads("tool")
+        with mock.patch.object(installer_class, "place", fail_helper):
+            with self.assertRaises(OSError):
+                self.installer().install_files(
+                    {"tool": None, "tool-helper": None}, "downloaded.file"
+                )
+        self.assertEqual(self.installed(), {"tool": b"tool"})
+        self.assertEqual(os.listdir(self.install_path), ["bin"])
+
+    def test_stale_staging_removed(self):
+        stale = os.path.join(self.install_path, ".bin-999999999-x")
+        running = os.path.join(self.install_path, f".bin-{os.getppid()}-x")
+        os.makedirs(os.path.join(stale, "tool"))
+        os.makedirs(running)
+        self.write_downloads("tool")
+        self.installer().install_files({"tool": None}, "downloaded.file")
+        self.assertEqual(self.installed(), {"tool": b"tool"})
+        self.assertEqual(
+            sorted(os.listdir(self.install_path)), [os.path.basename(running), "bin"]
+        )
+
+    def test_install_across_devices(self):
+        self.write_downloads("tool", "tool-helper")
+        rename = os.rename
+
+        def cross_device(source_path, target_path):
+            if source_path.startswith(self.download_path):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            rename(source_path, target_path)
+
+        with mock.patch("os.rename", cross_device):
+            self.installer(install_workers=2).install_files(
+                {"tool": None, "tool-helper": None}, "downloaded.file"
+            )
+        self.assertEqual(
+            self.installed(), {"tool": b"tool", "tool-helper": b"tool-helper"}
+        )
+        self.assertEqual(os.listdir(self.install_path), ["bin"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import legacy_file, version_cache  # noqa: E402
+
+TF_FILE = """
+terraform {
+  required_version = "~> 1.10.0"
+}
+"""
+
+
+class Test_LegacyFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, "project")
+        self.installs_path = os.path.join(self.tmp.name, "installs")
+        os.makedirs(self.dir)
+        os.makedirs(self.installs_path)
+        self.mtime = 1700000000
+        self.write("main.tf", TF_FILE)
+        self.write("variables.tf", 'variable "x" {}\n')
+        self.calls = list()
+        stdout_patcher = mock.patch("sys.stdout", new_callable=io.StringIO)
+        self.stdout = stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, content: str):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as fh:
+            fh.write(content)
+        # distinct mtimes, regardless of the filesystem's granularity
+        self.mtime += 1
+        os.utime(path, (self.mtime, self.mtime))
+
+    def legacy_files(self, **kwargs) -> legacy_file.LegacyFiles:
+        cache = version_cache.VersionCache(os.path.join(self.tmp.name, "cache"))
+        return legacy_file.LegacyFiles().modify(
+            **{"cache": cache, "installs_path": self.installs_path, **kwargs}
+        )
+
+    def detect(self, path: str) -> bool:
+        self.calls.append(path)
+        with open(path, "r") as fh:
+            return "required_version" in fh.read()
+
+    def resolve(self, path: str, installed: list[str]) -> str | None:
+        self.calls.append(path)
+        return installed[-1] if installed else "1.10.5"
+
+    def test_legacy_filenames(self):
+        for _ in range(2):
+            filenames = self.legacy_files().get_legacy_filenames(
+                [".terraform-version"], ".tf", self.detect, self.dir
+            )
+            self.assertEqual(filenames, [".terraform-version", "main.tf"])
+        self.assertEqual(len(self.calls), 2)
+        self.write("variables.tf", 'terraform {\n  required_version = "1.9.0"\n}\n')
+        filenames = self.legacy_files().get_legacy_filenames(
+            [".terraform-version"], ".tf", self.detect, self.dir
+        )
+        self.assertEqual(filenames, [".terraform-version", "main.tf", "variables.tf"])
+        self.assertEqual(len(self.calls), 4)
+
+    def test_legacy_version(self):
+        path = os.path.join(self.dir, "main.tf")
+        self.legacy_files().parse_legacy_file(path, self.resolve)
+        self.legacy_files().parse_legacy_file(path, self.resolve)
+        self.assertEqual(self.calls, [path])
+        os.mkdir(os.path.join(self.installs_path, "1.10.2"))
+        self.legacy_files().parse_legacy_file(path, self.resolve)
+        self.assertEqual(self.stdout.getvalue().split(), ["1.10.5"] * 2 + ["1.10.2"])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_legacy_version_siblings(self):
+        path = os.path.join(self.dir, "main.tf")
+        for _ in range(2):
+            self.legacy_files().parse_legacy_file(path, self.resolve, ".tf")
+        self.write("variables.tf", 'variable "y" {}\n')
+        self.legacy_files().parse_legacy_file(path, self.resolve, ".tf")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_without_cache(self):
+        path = os.path.join(self.dir, "main.tf")
+        for _ in range(2):
+            self.legacy_files(cache=None).parse_legacy_file(path, self.resolve)
+        self.assertEqual(len(self.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import io
+import os
+import re
+import sys
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import base_generic_list, lister_generic  # noqa: E402
+
+
+def chunked(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def response(body, encoding="utf-8"):
+    response = requests.Response()
+    response.raw = io.BytesIO(body)
+    response.encoding = encoding
+    return response
+
+
+INDEX = "\n".join(
+    f'<li><a href="/terraform/1.{minor}.{patch}/">1.{minor}.{patch}</a></li>'
+    for minor in range(12)
+    for patch in range(12)
+)
+FILTER = re.compile(r'href="/terraform/((?:[0-9]+\.){2}[0-9]+)/"')
+
+
+class Test_iter_matches(unittest.TestCase):
+    def test_same_as_findall_for_any_chunk_size(self):
+        expected = FILTER.findall(INDEX)
+        self.assertEqual(len(expected), 144)
+        for size in (1, 2, 3, 7, 31, 64, 1000, len(INDEX)):
+            with self.subTest(size=size):
+                matches = lister_generic.iter_matches(FILTER, chunked(INDEX, size), 64)
+                self.assertEqual([m.group(1) for m in matches], expected)
+
+    def test_match_not_cut_at_chunk_end(self):
+        pattern = re.compile(r"v([0-9.]+)")
+        matches = lister_generic.iter_matches(pattern, ["v1.2", "3.4 v2"], 16)
+        self.assertEqual([m.group(1) for m in matches], ["1.23.4", "2"])
+
+    def test_anchors(self):
+        text = "v1.0\nv1.1 v1.2\nxv1.3 v1.4\n" * 20
+        for pattern in (r"^v([0-9.]+)", r"(?m)^v([0-9.]+)", r"\bv([0-9.]+)"):
+            expected = re.findall(pattern, text)
+            for size in (1, 3, 7, 64):
+                with self.subTest(pattern=pattern, size=size):
+                    matches = lister_generic.iter_matches(
+                        re.compile(pattern), chunked(text, size), 8
+                    )
+                    self.assertEqual([m.group(1) for m in matches], expected)
+
+
+class Test_iter_json_array(unittest.TestCase):
+    def test_items(self):
+        items = [
+            {"tag_name": f"v1.{i}.0", "body": 'notes with "quotes", [brackets] {}'}
+            for i in range(50)
+        ] + [12345, "text", None]
+        text = json.dumps(items, indent=2)
+        for size in (1, 5, 64, len(text)):
+            with self.subTest(size=size):
+                self.assertEqual(
+                    list(lister_generic.iter_json_array(chunked(text, size))),
+                    items,
+                )
+
+    def test_empty(self):
+        self.assertEqual(list(lister_generic.iter_json_array(["[", " ]"])), [])
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(lister_generic.iter_json_array(['[{"a": 1}, {"b"']))
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(lister_generic.iter_json_array(['{"message": "Not Found"}']))
+
+
+class Test_iter_text(unittest.TestCase):
+    def test_multibyte_split(self):
+        text = "ünïcödé 1.2.3 " * 100
+        chunks = list(lister_generic.iter_text(response(text.encode()), 3))
+        self.assertEqual("".join(chunks), text)
+
+
+class Test_GenericLister(unittest.TestCase):
+    def test_extract_versions(self):
+        lister = lister_generic.GenericLister("http://localhost/").modify(
+            version_filter=FILTER,
+            chunk_size=100,
+        )
+        self.assertEqual(
+            lister.extract_versions(response(INDEX.encode())),
+            FILTER.findall(INDEX),
+        )
+
+    def test_sort_versions(self):
+        versions = ["1.10.0", "1.9.1", "1.10.0", "v1.2", "1.9.1"]
+        self.assertEqual(
+            base_generic_list.sort_versions(set(versions)), ["v1.2", "1.9.1", "1.10.0"]
+        )
+        versions = ["1.10.0", "1.10.0rc1", "1.9"]
+        self.assertIs(base_generic_list.sort_versions(versions), versions)
+        self.assertEqual(versions, ["1.9", "1.10.0rc1", "1.10.0"])
+        self.assertEqual(
+            base_generic_list.sort_alphanumeric({"b", "a", "c"}), ["a", "b", "c"]
+        )
+
+    def test_get_sorted_versions(self):
+        lister = lister_generic.GenericLister("http://localhost/").modify(cache=None)
+        upstream = FILTER.findall(INDEX) * 2
+        with mock.patch.object(lister, "get_versions", return_value=upstream):
+            sorted_versions = lister.get_sorted_versions(FILTER.pattern)
+        self.assertEqual(len(sorted_versions), 144)
+        self.assertEqual(sorted_versions.versions[-2:], ["1.11.10", "1.11.11"])
+        self.assertEqual(sorted_versions.keys[-1], (1, 11, 11))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,374 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import lister_github, version_cache  # noqa: E402
+
+RELEASES = [
+    {
+        "id": minor * 100 + patch,
+        "tag_name": f"v1.{minor}.{patch}",
+        "prerelease": False,
+        "draft": False,
+    }
+    for minor in range(30, 0, -1)
+    for patch in range(9, -1, -1)
+] + [
+    {"id": 1, "tag_name": "v2.0.0-rc.1", "prerelease": True, "draft": False},
+    {"id": 2, "tag_name": "v2.0.0", "prerelease": False, "draft": True},
+]
+
+TESTDATA = os.path.join(os.path.dirname(__file__), "testdata")
+# recorded GraphQL responses, keyed by the cursor requesting them
+GRAPHQL_PAGES = {
+    None: "github_graphql_releases_1.json",
+    "Y3Vyc29yOnYyOpK5MjAyNC0wNS0xNVQxNzo1MzowMCswMDowMM4JcF2x": (
+        "github_graphql_releases_2.json"
+    ),
+}
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if urlparse(self.path).path.endswith("/latest"):
+            self.latest()
+            return
+        query = parse_qs(urlparse(self.path).query)
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        releases = self.server.releases
+        last = (len(releases) + per_page - 1) // per_page
+        self.server.pages.append(page)
+        body = json.dumps(releases[(page - 1) * per_page : page * per_page])
+        etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        base = f"http://127.0.0.1:{self.server.server_port}/releases"
+        links = []
+        if page < last:
+            links.append(f'<{base}?per_page={per_page}&page={page + 1}>; rel="next"')
+            links.append(f'<{base}?per_page={per_page}&page={last}>; rel="last"')
+        if links:
+            self.send_header("Link", ", ".join(links))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def latest(self):
+        self.server.latest += 1
+        for release in self.server.releases:
+            if not release["prerelease"] and not release["draft"]:
+                body = json.dumps(release).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self.send_response(404)
+        self.end_headers()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.graphql.append(request["variables"])
+        if not self.headers.get("Authorization"):
+            self.send_response(401)
+            self.end_headers()
+            return
+        fixture = GRAPHQL_PAGES[request["variables"]["cursor"]]
+        with open(os.path.join(TESTDATA, fixture), "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Test_GithubLister(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGithubHandler)
+        self.server.pages = []
+        self.server.failures = 0
+        self.server.graphql = []
+        self.server.latest = 0
+        self.server.releases = list(RELEASES)
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/releases"
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_dir.cleanup()
+
+    def lister(self, **kwargs):
+        return lister_github.GithubLister("owner/repo").modify(
+            **{
+                "url": self.url,
+                "params": {"per_page": 7, "page": 1},
+                "cache": None,
+                **kwargs,
+            }
+        )
+
+    def test_sequential(self):
+        versions = self.lister(max_workers=1).get_final_versions(
+            r"^v?((?:[0-9]+\.){2}[0-9]+)$"
+        )
+        self.assertEqual(len(versions), 300)
+        self.assertEqual(versions[0], "1.1.0")
+        self.assertEqual(versions[-1], "1.30.9")
+        self.assertEqual(self.server.pages, list(range(1, 45)))
+
+    def test_sequential_reads_each_page(self):
+        lister = self.lister(max_workers=1)
+        responses = []
+        request_page = lister.request_page
+
+        def record_page(page, revalidate=False):
+            # the previous page is read & its connection free again
+            self.assertTrue(all(r._content_consumed for r in responses))
+            responses.append(request_page(page, revalidate))
+            return responses[-1]
+
+        lister.request_page = record_page
+        lister.do_requests()
+        self.assertEqual(len(responses), 44)
+
+    def test_concurrent_same_as_sequential(self):
+        sequential = self.lister(max_workers=1).do_requests()
+        concurrent = self.lister(max_workers=4).do_requests()
+        self.assertListEqual(
+            [r.json() for r in sequential],
+            [r.json() for r in concurrent],
+        )
+        self.assertEqual(
+            self.lister(max_workers=1).get_final_versions(r"^v?(.*)$"),
+            self.lister(max_workers=4).get_final_versions(r"^v?(.*)$"),
+        )
+
+    def test_single_page(self):
+        lister = self.lister(max_workers=4)
+        lister.params["per_page"] = 1000
+        self.assertEqual(len(lister.do_requests()), 1)
+        self.assertEqual(self.server.pages, [1])
+
+    def test_retry_on_server_error(self):
+        self.server.failures = 2
+        lister = self.lister(max_workers=1)
+        lister.params["per_page"] = 1000
+        self.assertEqual(len(lister.do_requests()), 1)
+        self.assertEqual(self.server.failures, 0)
+
+    def test_cache_revalidate(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=0)
+        first = self.lister(cache=cache).get_final_versions(r"^v?(.*)$")
+        self.assertEqual(len(self.server.pages), 44)
+        self.server.pages.clear()
+        second = self.lister(cache=cache).get_final_versions(r"^v?(.*)$")
+        self.assertEqual(first, second)
+        # a 304 on the first page is served from disk
+        self.assertEqual(self.server.pages, [1])
+
+    def test_cache_revalidate_other_filter(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=0)
+        lister = self.lister(cache=cache, max_workers=1)
+        lister.get_final_versions(r"^v(1\.1\.[0-9])$")
+        lister.get_final_versions(r"^v(1\.1\.[0-9])$")
+        self.assertEqual(len(lister.get_final_versions(r"^v(1\.2\.[0-9])$")), 10)
+
+    def test_cache_ttl(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=3600)
+        first = self.lister(cache=cache).get_final_versions(r"^v?(.*)$")
+        self.server.pages.clear()
+        second = self.lister(cache=cache).get_final_versions(r"^v?(.*)$")
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.pages, [])
+
+    def test_cache_keyed_by_filter(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=3600)
+        self.lister(cache=cache).get_final_versions(r"^v?(.*)$")
+        versions = self.lister(cache=cache).get_final_versions(r"^v(1\.1\.[0-9])$")
+        self.assertEqual(len(versions), 10)
+
+    def test_incremental(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=0)
+        full = self.lister(cache=None).get_final_versions(r"^v?(.*)$")
+        first = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertEqual(first, full)
+        self.server.pages.clear()
+        self.server.releases.insert(
+            0, {"id": 9999, "tag_name": "v3.0.0", "prerelease": False, "draft": False}
+        )
+        second = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertEqual(second, full + ["3.0.0"])
+        self.assertEqual(self.server.pages, [1])
+        self.server.pages.clear()
+        third = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertEqual(third, second)
+        self.assertEqual(self.server.pages, [1])
+
+    def test_incremental_draft_published(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=0)
+        draft = {"id": 9999, "tag_name": "v3.0.0", "prerelease": False, "draft": True}
+        self.server.releases.insert(0, draft)
+        first = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertNotIn("3.0.0", first)
+        draft["draft"] = False
+        second = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertEqual(second, first + ["3.0.0"])
+
+    def test_incremental_draft_lower_id_published(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=0)
+        draft = {"id": 5, "tag_name": "v3.1.0", "prerelease": False, "draft": True}
+        release = {"id": 9999, "tag_name": "v3.0.0", "prerelease": False}
+        self.server.releases[:0] = [draft, {**release, "draft": False}]
+        first = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertIn("3.0.0", first)
+        self.assertNotIn("3.1.0", first)
+        # the draft is published after the newer release was synced
+        draft["draft"] = False
+        second = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertEqual(second, first + ["3.1.0"])
+
+    def test_incremental_expired_full_sync(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=0)
+        first = self.lister(
+            cache=cache, incremental=True, incremental_max_age=0
+        ).get_final_versions(r"^v?(.*)$")
+        # the first page is unchanged, a revalidation would answer 304
+        deleted = self.server.releases.pop(-3)
+        self.assertIn(deleted["tag_name"].lstrip("v"), first)
+        second = self.lister(
+            cache=cache, incremental=True, incremental_max_age=0
+        ).get_final_versions(r"^v?(.*)$")
+        self.assertNotIn(deleted["tag_name"].lstrip("v"), second)
+        self.assertEqual(len(second), len(first) - 1)
+
+    def test_incremental_multiple_pages(self):
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=0)
+        self.lister(cache=cache, incremental=True).get_final_versions(r"^v?(.*)$")
+        self.server.pages.clear()
+        for i in range(10):
+            self.server.releases.insert(
+                0,
+                {
+                    "id": 10000 + i,
+                    "tag_name": f"v3.0.{i}",
+                    "prerelease": False,
+                    "draft": False,
+                },
+            )
+        versions = self.lister(cache=cache, incremental=True).get_final_versions(
+            r"^v?(.*)$"
+        )
+        self.assertEqual(versions[-10:], [f"3.0.{i}" for i in range(10)])
+        self.assertEqual(self.server.pages, [1, 2])
+
+    def test_graphql(self):
+        lister = self.lister(
+            backend="graphql",
+            graphql_url=self.url.replace("/releases", "/graphql"),
+            headers={"Authorization": "token secret"},
+        )
+        versions = lister.get_final_versions(r"^v?((?:[0-9]+\.){2}[0-9]+)$")
+        self.assertEqual(len(versions), 18)
+        self.assertEqual(versions[0], "1.28.0")
+        self.assertEqual(versions[-1], "1.30.5")
+        self.assertEqual(
+            [v["cursor"] for v in self.server.graphql],
+            list(GRAPHQL_PAGES),
+        )
+        self.assertEqual(self.server.graphql[0]["owner"], "owner")
+        self.assertEqual(self.server.graphql[0]["name"], "repo")
+        self.assertEqual(self.server.pages, [])
+
+    def test_graphql_without_token_uses_rest(self):
+        lister = self.lister(
+            backend="graphql",
+            graphql_url=self.url.replace("/releases", "/graphql"),
+            headers=None,
+        )
+        versions = lister.get_final_versions(r"^v?((?:[0-9]+\.){2}[0-9]+)$")
+        self.assertEqual(len(versions), 300)
+        self.assertEqual(self.server.graphql, [])
+
+    def test_latest_stable(self):
+        filter = r"^v?((?:[0-9]+\.){2}[0-9]+)$"
+        self.assertEqual(self.lister().get_latest_stable(filter), "1.30.9")
+        self.assertEqual(self.server.latest, 1)
+        self.assertEqual(self.server.pages, [1])
+        self.server.pages.clear()
+        self.server.releases.insert(0, {**RELEASES[0], "tag_name": "tools/v9.0.0"})
+        self.assertEqual(self.lister().get_latest_stable(filter), "1.30.9")
+        self.assertEqual(self.server.pages, [1])
+
+    def test_latest_stable_older_branch_released_last(self):
+        filter = r"^v?((?:[0-9]+\.){2}[0-9]+)$"
+        self.server.releases.insert(0, {**RELEASES[0], "tag_name": "v1.29.10"})
+        self.assertEqual(self.lister().get_latest_stable(filter), "1.30.9")
+        self.assertEqual(self.server.latest, 1)
+        self.assertEqual(self.server.pages, [1])
+
+    def test_latest_stable_query_stops_at_first_match(self):
+        filter = r"^v?((?:[0-9]+\.){2}[0-9]+)$"
+        lister = self.lister()
+        self.assertEqual(lister.get_latest_stable(filter, "1.28"), "1.28.9")
+        self.assertEqual(self.server.pages, [1, 2, 3])
+        self.server.pages.clear()
+        self.assertEqual(lister.get_latest_stable(filter, "~> 1.27.0"), "1.27.9")
+        self.assertEqual(self.server.pages, [1, 2, 3, 4, 5])
+        self.server.pages.clear()
+        self.assertIsNone(lister.get_latest_stable(filter, "3."))
+        self.assertEqual(len(self.server.pages), 44)
+        self.assertEqual(self.server.latest, 0)
+
+    def test_latest_stable_uses_fresh_cache(self):
+        filter = r"^v?((?:[0-9]+\.){2}[0-9]+)$"
+        cache = version_cache.VersionCache(self.cache_dir.name, ttl=3600)
+        self.lister(cache=cache).get_final_versions(filter)
+        self.server.pages.clear()
+        lister = self.lister(cache=cache)
+        self.assertEqual(lister.get_latest_stable(filter, "1.2"), "1.29.9")
+        self.assertEqual(lister.get_latest_stable(filter, "< 1.3"), "1.2.9")
+        self.assertEqual(self.server.pages, [])
+        self.assertEqual(self.server.latest, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
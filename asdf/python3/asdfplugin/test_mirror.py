@@ -0,0 +1,193 @@
+import io
+import os
+import sys
+import json
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import (  # noqa: E402
+    downloader_generic,
+    lister_generic,
+    mirror,
+    session,
+    version_cache,
+)
+
+UPSTREAM = "https://releases.example.com/"
+INDEX_HTML = "".join(
+    f'<a href="/tool/1.{minor}.0/">tool_1.{minor}.0</a>\n' for minor in range(5)
+)
+CONTENT = bytes(range(256)) * 100
+
+
+class Test_Mirror(unittest.TestCase):
+    def setUp(self):
+        self.tree = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tree.name, "tool", "1.4.0"))
+        with open(os.path.join(self.tree.name, "tool", "index.html"), "w") as fh:
+            fh.write(INDEX_HTML)
+        zip_path = os.path.join(self.tree.name, "tool", "1.4.0", "tool.zip")
+        with open(zip_path, "wb") as fh:
+            fh.write(CONTENT)
+        with open(os.path.join(self.tree.name, "releases.json"), "w") as fh:
+            json.dump([{"tag_name": "v1.4.0"}], fh)
+        mirror.update_index(
+            self.tree.name,
+            {"https://api.example.com/releases?page=1": "releases.json"},
+        )
+        self.file_url = "file://" + self.tree.name + "/"
+        stdout_patcher = mock.patch("sys.stdout", new_callable=io.StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+    def tearDown(self):
+        self.tree.cleanup()
+
+    def serve_tree(self):
+        """A local http.server standing in for an http mirror."""
+        directory = self.tree.name
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=directory, **kwargs)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/"
+
+    def test_load_mirrors(self):
+        config = {UPSTREAM: self.file_url}
+        with mock.patch.dict(os.environ, {"ASDF_PLUGIN_MIRRORS": json.dumps(config)}):
+            self.assertEqual(mirror.load_mirrors(), config)
+        config_path = os.path.join(self.tree.name, "mirrors.json")
+        with open(config_path, "w") as fh:
+            json.dump(config, fh)
+        with mock.patch.dict(os.environ, {"ASDF_PLUGIN_MIRRORS": config_path}):
+            self.assertEqual(mirror.load_mirrors(), config)
+
+    def test_http_mirror(self):
+        s = session.new_session(mirrors={UPSTREAM: self.serve_tree()}, offline=True)
+        r = s.get(UPSTREAM + "tool/1.4.0/tool.zip")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, CONTENT)
+
+    def test_file_mirror(self):
+        s = session.new_session(mirrors={UPSTREAM: self.file_url})
+        r = s.get(UPSTREAM + "tool/1.4.0/tool.zip")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, CONTENT)
+        self.assertEqual(r.url, UPSTREAM + "tool/1.4.0/tool.zip")
+        # directories are served by their index.html
+        self.assertEqual(s.get(UPSTREAM + "tool").text, INDEX_HTML)
+        self.assertEqual(s.get(UPSTREAM + "tool/1.5.0/tool.zip").status_code, 404)
+        self.assertEqual(s.get(UPSTREAM + "../../etc/passwd").status_code, 404)
+        self.assertEqual(s.post(UPSTREAM + "tool").status_code, 405)
+
+    def test_file_mirror_range_and_etag(self):
+        s = session.new_session(mirrors={UPSTREAM: self.file_url})
+        url = UPSTREAM + "tool/1.4.0/tool.zip"
+        r = s.get(url, headers={"Range": "bytes=100-"})
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r.content, CONTENT[100:])
+        r = s.get(url, headers={"Range": "bytes=0-9"})
+        self.assertEqual(r.content, CONTENT[:10])
+        self.assertEqual(r.headers["Content-Range"], f"bytes 0-9/{len(CONTENT)}")
+        r = s.get(url, headers={"Range": f"bytes={len(CONTENT)}-"})
+        self.assertEqual(r.status_code, 416)
+        head = s.head(url)
+        self.assertEqual(head.headers["Content-Length"], str(len(CONTENT)))
+        r = s.get(url, headers={"If-None-Match": head.headers["ETag"]})
+        self.assertEqual(r.status_code, 304)
+        etag = head.headers["ETag"]
+        r = s.get(url, headers={"Range": "bytes=100-", "If-Range": etag})
+        self.assertEqual(r.status_code, 206)
+        r = s.get(url, headers={"Range": "bytes=100-", "If-Range": '"changed"'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, CONTENT)
+
+    def test_file_mirror_index(self):
+        s = session.new_session(mirrors={"https://api.example.com/": self.file_url})
+        r = s.get("https://api.example.com/releases", params={"page": 1})
+        self.assertEqual(r.json(), [{"tag_name": "v1.4.0"}])
+
+    def test_offline(self):
+        s = session.new_session(mirrors={UPSTREAM: self.file_url}, offline=True)
+        self.assertEqual(s.get(UPSTREAM + "tool").status_code, 200)
+        with self.assertRaises(requests.ConnectionError):
+            s.get("https://api.example.com/releases")
+
+    def test_lister_offline_uses_cache(self):
+        cache = version_cache.VersionCache(os.path.join(self.tree.name, "cache"))
+        filter = r'href="/tool/((?:[0-9]+\.){2}[0-9]+)/"'
+        online = session.new_session(mirrors={UPSTREAM: self.file_url})
+        versions = (
+            lister_generic.GenericLister(UPSTREAM + "tool")
+            .modify(cache=cache, session=online)
+            .get_final_versions(filter)
+        )
+        self.assertEqual(versions, [f"1.{minor}.0" for minor in range(5)])
+        offline = session.new_session(mirrors={}, offline=True)
+        lister = lister_generic.GenericLister(UPSTREAM + "tool").modify(session=offline)
+        with mock.patch("sys.stderr", new_callable=io.StringIO):
+            lister.modify(cache=cache)
+            self.assertEqual(lister.get_final_versions(filter), versions)
+        with self.assertRaises(requests.ConnectionError):
+            lister.modify(cache=None).get_final_versions(filter)
+
+    def test_lister_refused_doesnt_use_cache(self):
+        cache = version_cache.VersionCache(os.path.join(self.tree.name, "cache"))
+        filter = r'href="/tool/((?:[0-9]+\.){2}[0-9]+)/"'
+        online = session.new_session(mirrors={UPSTREAM: self.file_url})
+        lister = lister_generic.GenericLister(UPSTREAM + "tool").modify(
+            cache=cache, session=online
+        )
+        lister.get_final_versions(filter)
+        os.remove(os.path.join(self.tree.name, "tool", "index.html"))
+        with self.assertRaises(requests.HTTPError):
+            lister.get_final_versions(filter)
+
+    def test_is_offline(self):
+        for value, offline in (("1", True), ("yes", True), ("", False)):
+            with mock.patch.dict(os.environ, {"ASDF_PLUGIN_OFFLINE": value}):
+                self.assertEqual(mirror.is_offline(), offline)
+        for value in ("0", "no", "off", "false", "False"):
+            with mock.patch.dict(os.environ, {"ASDF_PLUGIN_OFFLINE": value}):
+                self.assertFalse(mirror.is_offline())
+
+    def test_download_from_file_mirror(self):
+        with tempfile.TemporaryDirectory() as download_path:
+            env = {
+                "ASDF_DOWNLOAD_PATH": download_path,
+                "ASDF_INSTALL_PATH": download_path,
+                "ASDF_INSTALL_VERSION": "1.4.0",
+                "ASDF_INSTALL_TYPE": "version",
+            }
+            with mock.patch.dict(os.environ, env):
+                offline = session.new_session(
+                    mirrors={UPSTREAM: self.file_url}, offline=True
+                )
+                downloader = downloader_generic.GenericDownloader(
+                    UPSTREAM + "tool/{version}"
+                )
+                downloader.modify(
+                    session=offline,
+                    parallel_parts=4,
+                    parallel_min_size=1,
+                ).download("tool.zip")
+            with open(os.path.join(download_path, "downloaded.file"), "rb") as fh:
+                self.assertEqual(fh.read(), CONTENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import session  # noqa: E402
+
+
+class ForbiddenHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.path == "/rate-limited" and self.server.requests == 1:
+            self.send_response(403)
+            self.send_header("X-RateLimit-Remaining", "0")
+            self.send_header("X-RateLimit-Reset", str(int(time.time()) + 1))
+        elif self.path == "/forbidden":
+            self.send_response(403)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class Test_session(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ForbiddenHandler)
+        self.server.requests = 0
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.session = session.new_session(mirrors={}, offline=False, backoff=0)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def test_retry_rate_limit(self):
+        response = self.session.get(f"{self.url}/rate-limited")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_no_retry_forbidden(self):
+        response = self.session.get(f"{self.url}/forbidden")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.server.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
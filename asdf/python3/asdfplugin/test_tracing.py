@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from asdfplugin import session, tracing  # noqa: E402
+
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "5")
+        self.send_header("X-RateLimit-Limit", "60")
+        self.send_header("X-RateLimit-Remaining", "59")
+        self.end_headers()
+        self.wfile.write(b"hello")
+
+
+class Test_tracing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.trace_path = os.path.join(self.tmp.name, "trace.jsonl")
+        patcher = mock.patch.dict(os.environ, {"ASDF_PLUGIN_TRACE": self.trace_path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def spans(self):
+        with open(self.trace_path, "r") as fh:
+            return {record["name"]: record for record in map(json.loads, fh)}
+
+    def test_disabled(self):
+        with mock.patch.dict(os.environ, {"ASDF_PLUGIN_TRACE": ""}):
+            with tracing.span("phase") as span:
+                self.assertIs(span, tracing.NO_SPAN)
+                span.add("bytes", 10)
+        self.assertFalse(os.path.exists(self.trace_path))
+
+    def test_nested(self):
+        with tracing.span("outer", url="http://x") as outer:
+            with tracing.span("inner") as inner:
+                inner.add("bytes", 10)
+                inner.add("bytes", 5)
+            outer.set(versions=3)
+        spans = self.spans()
+        self.assertEqual(spans["inner"]["parent_id"], spans["outer"]["span_id"])
+        self.assertIsNone(spans["outer"]["parent_id"])
+        self.assertEqual(spans["inner"]["trace_id"], spans["outer"]["trace_id"])
+        self.assertEqual(spans["inner"]["attributes"], {"bytes": 15})
+        self.assertEqual(
+            spans["outer"]["attributes"], {"url": "http://x", "versions": 3}
+        )
+        self.assertGreaterEqual(spans["outer"]["duration"], spans["inner"]["duration"])
+        self.assertEqual(spans["outer"]["status"], "ok")
+
+    def test_error(self):
+        class Phases(object):
+            @tracing.traced("fail")
+            def fail(self):
+                raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            Phases().fail()
+        record = self.spans()["fail"]
+        self.assertEqual(record["status"], "error")
+        self.assertEqual(record["attributes"]["class"], "Phases")
+        self.assertIn("boom", record["attributes"]["error"])
+
+    def test_worker_thread(self):
+        with tracing.span("download"):
+            worker = threading.Thread(
+                target=tracing.propagate(lambda: tracing.current_span().add("parts"))
+            )
+            worker.start()
+            worker.join()
+            # other threads don't report into spans they weren't given
+            other = threading.Thread(target=lambda: tracing.current_span().add("parts"))
+            other.start()
+            other.join()
+        self.assertEqual(self.spans()["download"]["attributes"], {"parts": 1})
+
+    def test_start_run(self):
+        tracing.start_run("/plugins/one/bin/download")
+        with tracing.span("first"):
+            pass
+        with mock.patch.dict(os.environ, {"ASDF_PLUGIN_PATH": "/plugins/two"}):
+            tracing.start_run("/plugins/two/bin/install")
+            with tracing.span("second"):
+                pass
+        spans = self.spans()
+        self.assertNotEqual(spans["first"]["trace_id"], spans["second"]["trace_id"])
+        self.assertEqual(spans["second"]["resource"]["plugin"], "two")
+        self.assertEqual(spans["second"]["resource"]["command"], "install")
+        self.assertEqual(spans["first"]["resource"]["command"], "download")
+
+    def test_record_response(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), RateLimitedHandler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        s = session.new_session(mirrors={}, offline=False)
+        with tracing.span("list"):
+            s.get(f"http://127.0.0.1:{server.server_port}/").content
+            s.get(f"http://127.0.0.1:{server.server_port}/").content
+        attributes = self.spans()["list"]["attributes"]
+        self.assertEqual(attributes["http.requests"], 2)
+        self.assertEqual(attributes["http.response_bytes"], 10)
+        self.assertEqual(attributes["http.x-ratelimit-remaining"], "59")
+        self.assertGreater(attributes["http.elapsed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
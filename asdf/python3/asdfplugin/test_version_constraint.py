@@ -1,5 +1,8 @@
 import unittest
 import io
+import os
+import tempfile
+import itertools
 import version_constraint
 
 
@@ -289,12 +292,173 @@ terraform {
         self.assertIsNot(c, None)
         self.assertEqual(str(c), ">= 1.10.5, < 1.12, != 1.11.2")
 
+    def test_constraint_from_tf_file_multiple_blocks(self):
+        c = version_constraint.constraint_from_tf_file(io.StringIO("""
+terraform {
+  backend "s3" {}
+}
+required_version = "1.0.0"
+terraform { required_version = ">= 1.3" }
+terraform {
+  required_version = "< 1.6, != 1.5.0"
+}
+"""))
+        self.assertEqual(str(c), ">= 1.3, < 1.6, != 1.5.0")
+
+    def test_required_version_from_tf_file_stops_at_first(self):
+        lines = iter(['terraform { required_version = "1.5.7" }\n'])
+        tf_file = itertools.chain(lines, ['terraform { required_version = "1.0" }\n'])
+        self.assertEqual(
+            version_constraint.required_version_from_tf_file(tf_file), "1.5.7"
+        )
+        self.assertEqual(next(tf_file), 'terraform { required_version = "1.0" }\n')
+
+    def test_required_version_from_tf_file(self):
+        cases = {
+            'terraform { required_version = "1.5.7" }\n': "1.5.7",
+            'terraform {\n  # required_version = "1.0.0"\n}\n': None,
+            'resource "x" "y" {\n  required_version = "1.0.0"\n}\n': None,
+            """
+/* terraform {
+  required_version = "1.0.0"
+} */
+locals {
+  script = <<-EOT
+    terraform {
+      required_version = "1.0.0"
+    }
+  EOT
+  braces = "}}"
+}
+terraform {
+  required_providers {
+    x = { source = "y", required_version = "1.0.0" }
+  }
+  // required_version = "1.1.0"
+  required_version = "~> 1.5" # newest
+}
+""": "~> 1.5",
+        }
+        for content, expected in cases.items():
+            with self.subTest(content=content):
+                self.assertEqual(
+                    version_constraint.required_version_from_tf_file(
+                        io.StringIO(content)
+                    ),
+                    expected,
+                )
+
+    def test_constraint_from_tf_dir(self):
+        files = {
+            "versions.tf": 'terraform {\n  required_version = ">= 1.3"\n}\n',
+            "main.tf": 'terraform {\n  required_version = "< 1.6, != 1.5.0"\n}\n',
+            "outputs.tf": 'output "x" {\n  value = 1\n}\n',
+            "README.md": 'terraform {\n  required_version = "1.0.0"\n}\n',
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, content in files.items():
+                with open(os.path.join(tmp, name), "w") as fh:
+                    fh.write(content)
+            for max_workers in (1, 8):
+                c = version_constraint.constraint_from_tf_dir(tmp, max_workers)
+                self.assertEqual(str(c), "< 1.6, != 1.5.0, >= 1.3")
+                self.assertEqual(
+                    c.filter_versions(["1.2.0", "1.3.0", "1.5.0", "1.5.7", "1.6.0"]),
+                    ["1.3.0", "1.5.7"],
+                )
+            os.remove(os.path.join(tmp, "main.tf"))
+            os.remove(os.path.join(tmp, "versions.tf"))
+            self.assertIsNone(version_constraint.constraint_from_tf_dir(tmp))
+
     def test_stringify(self):
         in_str = ">= 1.10.5, < 1.12, != 1.11.2"
         c = version_constraint.constraint_from_tf_string(in_str)
         out_str = str(c)
         self.assertEqual(in_str, out_str)
 
+    def test_version_key(self):
+        self.assertEqual(version_constraint.version_key("1.2.3"), (1, 2, 3))
+        self.assertEqual(version_constraint.version_key("v1.2.0"), (1, 2))
+        self.assertEqual(version_constraint.version_key("1.10"), (1, 10))
+        self.assertIsNone(version_constraint.version_key("1.2.3-rc1"))
+        self.assertIsNone(version_constraint.version_key("2024-01-01T00-00-00Z"))
+
+    def test_version_keys(self):
+        versions = ["1.2.3", "v1.2.0", "1.10", "0", "0.0.1", "01.2"]
+        self.assertEqual(
+            version_constraint.version_keys(versions),
+            [version_constraint.version_key(v) for v in versions],
+        )
+        self.assertEqual(version_constraint.version_keys([]), [])
+        self.assertIsNone(version_constraint.version_keys(["1.2.3", "1.2.3-rc1"]))
+        self.assertIsNone(version_constraint.version_keys(["1.2\n3"]))
+
+    def test_sorted_versions(self):
+        versions = version_constraint.SortedVersions(["1.10.0", "1.9.1", "1.2"])
+        self.assertListEqual(versions.versions, ["1.2", "1.9.1", "1.10.0"])
+        versions = version_constraint.SortedVersions(["1.10.0", "1.10.0rc1", "1.9"])
+        self.assertListEqual(versions.versions, ["1.9", "1.10.0rc1", "1.10.0"])
+
+    def test_compiled_matches_test_version(self):
+        versions = [
+            f"{major}.{minor}.{patch}"
+            for major in range(3)
+            for minor in range(12)
+            for patch in range(12)
+        ] + ["1", "1.2", "2.5", "3"]
+        sorted_versions = version_constraint.SortedVersions(versions)
+        for constraint in [
+            ">= 1.2.3, <= 3, != 2.5, != 1.2.4",
+            ">= 1.2.3, <= 3, != 2.5, 1.2.4",
+            "~> 1.10.5",
+            "> 1.2, < 1.3",
+            "!= 2.11.11",
+            "1.2",
+            ">= 3.0.1",
+            "> 0.11.11, < 1",
+        ]:
+            c = version_constraint.constraint_from_tf_string(constraint)
+            filtered = c.filter_versions(versions)
+            filtered.sort(key=version_constraint.Version)
+            self.assertListEqual(
+                c.compile().filter_versions(sorted_versions), filtered, constraint
+            )
+            self.assertEqual(
+                c.latest_matching(sorted_versions),
+                filtered[-1] if filtered else None,
+                constraint,
+            )
+
+    def test_compiled_non_plain_constraint(self):
+        c = version_constraint.VersionConstraint([("<", "1.3.0rc1")])
+        self.assertEqual(c.latest_matching(["1.2.9", "1.3.0", "1.2.10"]), "1.2.10")
+
+    def test_resolve_constraints(self):
+        versions = [f"1.{minor}.{patch}" for minor in range(12) for patch in range(8)]
+        constraints = [
+            ">= 1.2.3, < 1.5",
+            "< 1.5, >= 1.2.3",
+            "~> 1.10.2",
+            "1.3.3",
+            "> 2",
+            version_constraint.constraint_from_tf_string("!= 1.11.7"),
+        ] * 3
+        parsed = [
+            version_constraint.constraint_from_tf_string(c) if isinstance(c, str) else c
+            for c in constraints
+        ]
+        expected = [c.latest_matching(versions) for c in parsed]
+        resolver = version_constraint.ConstraintResolver(versions)
+        self.assertListEqual(resolver.resolve(constraints), expected)
+        self.assertEqual(
+            expected[:6], ["1.4.7", "1.4.7", "1.10.7", "1.3.3", None, "1.11.6"]
+        )
+        # order & repetition of constraints don't matter
+        self.assertEqual(len(resolver._latest), 5)
+        self.assertListEqual(
+            version_constraint.resolve_constraints(versions, constraints), expected
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
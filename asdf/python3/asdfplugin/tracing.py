@@ -0,0 +1,219 @@
+from .environment import environ
+import os
+import sys
+import json
+import time
+import secrets
+import threading
+import functools
+import contextlib
+from typing import Callable, Iterator
+
+# per thread: the stack of open spans & the script run they belong to
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def trace_path() -> str | None:
+    """
+    Returns where to write spans to, $ASDF_PLUGIN_TRACE is the path of a
+    JSON lines file or "-" for stderr.
+    Returns None if tracing is disabled, which is the default.
+    """
+    return environ().get("ASDF_PLUGIN_TRACE") or None
+
+
+def start_run(script: str | None = None):
+    """
+    Start tracing a new script run in the current thread: the following
+    spans get a new trace_id & their resource is taken from the current
+    environment. script defaults to sys.argv[0].
+    Entry points running several scripts in one process (batch_install,
+    the daemon) call this per script, otherwise a run is started on the
+    first span.
+    """
+    if script is None:
+        script = sys.argv[0] if sys.argv else ""
+    _local.run = {"trace_id": secrets.token_hex(16), "script": script}
+    _local.resource = None
+    _local.stack = []
+
+
+def resource() -> dict[str, any]:
+    """Returns what identifies the traced run (plugin, command, pid)."""
+    if getattr(_local, "resource", None) is None:
+        from .version_cache import plugin_name
+
+        _local.resource = {
+            "plugin": plugin_name(),
+            "command": os.path.basename(current_run()["script"]),
+            "pid": os.getpid(),
+        }
+    return _local.resource
+
+
+def current_run() -> dict[str, str]:
+    """Returns the script run of the current thread, starting one if needed."""
+    if getattr(_local, "run", None) is None:
+        start_run()
+    return _local.run
+
+
+class Span(object):
+    """
+    Span records timing & attributes (byte counts, request counts, ...) of
+    a single phase, like an OpenTelemetry span.
+    """
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        if parent is not None:
+            self.trace_id, self.resource = parent.trace_id, parent.resource
+        else:
+            self.trace_id, self.resource = current_run()["trace_id"], resource()
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.start = time.time()
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, **attributes: dict[str, any]):
+        """Set attributes of this span."""
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def add(self, key: str, value: int | float = 1):
+        """Add value to the counter attribute key."""
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def record(self) -> dict[str, any]:
+        """Returns the span as JSON serializable dict."""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+            "resource": self.resource,
+        }
+
+
+class NoSpan(object):
+    """NoSpan is used if tracing is disabled, it ignores everything."""
+
+    def set(self, **attributes: dict[str, any]):
+        pass
+
+    def add(self, key: str, value: int | float = 1):
+        pass
+
+
+NO_SPAN = NoSpan()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: dict[str, any]) -> Iterator[Span | NoSpan]:
+    """
+    Trace the enclosed phase as span name, nested in the current span.
+    The span is written as a JSON line when the phase ends.
+    Yields NO_SPAN if tracing is disabled.
+    """
+    path = trace_path()
+    if path is None:
+        yield NO_SPAN
+        return
+    stack = _local.__dict__.setdefault("stack", [])
+    current = Span(name, stack[-1] if stack else None, attributes)
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.set(error=repr(e))
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        stack.pop()
+        emit(path, current.record())
+
+
+def traced(name: str) -> Callable:
+    """Decorator tracing each call of a method as span name."""
+
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with span(name, **{"class": self.__class__.__name__}):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_span() -> Span | NoSpan:
+    """
+    Returns the innermost open span of this thread.
+    Worker threads only have one if their function is wrapped by propagate().
+    """
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else NO_SPAN
+
+
+def propagate(function: Callable) -> Callable:
+    """
+    Wrap function to run in the current span of the calling thread, e.g.
+    executor.submit(propagate(fetch), url), so the spans & counters of a
+    worker thread end up in the run & span which started the work.
+    """
+    parent = current_span()
+    stack = [parent] if isinstance(parent, Span) else []
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        previous = _local.__dict__.get("stack")
+        _local.stack = list(stack)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.stack = previous
+
+    return wrapper
+
+
+def emit(path: str, record: dict[str, any]):
+    """Append record as a JSON line to path ("-" is stderr)."""
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if path == "-":
+            sys.stderr.write(line)
+        else:
+            with open(path, "a") as fh:
+                fh.write(line)
+
+
+def record_response(response, *args, **kwargs):
+    """
+    requests response hook counting requests, time to response headers,
+    announced bytes & the rate limit state on the current span.
+    """
+    current = current_span()
+    if current is NO_SPAN:
+        return
+    current.add("http.requests")
+    current.add("http.elapsed", response.elapsed.total_seconds())
+    length = response.headers.get("Content-Length", "")
+    if length.isdigit():
+        current.add("http.response_bytes", int(length))
+    if response.status_code >= 400:
+        current.add("http.errors")
+    for header in ("X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"):
+        if header in response.headers:
+            current.set(**{f"http.{header.lower()}": response.headers[header]})
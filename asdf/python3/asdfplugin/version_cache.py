@@ -0,0 +1,102 @@
+from .environment import environ
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+
+
+class NotModified(Exception):
+    """Raised by a lister if upstream confirmed the cached versions."""
+
+
+def asdf_data_dir() -> str:
+    """Returns $ASDF_DATA_DIR, defaulting to ~/.asdf."""
+    return environ().get("ASDF_DATA_DIR") or os.path.join(
+        os.path.expanduser("~"), ".asdf"
+    )
+
+
+def plugin_name() -> str:
+    """
+    Returns the name of the running plugin, taken from $ASDF_PLUGIN_PATH
+    or derived from the path of the executed script
+    (e.g. ~/.asdf/plugins/sops/bin/list-all -> "sops").
+    """
+    plugin_path = environ().get("ASDF_PLUGIN_PATH")
+    if plugin_path:
+        return os.path.basename(os.path.normpath(plugin_path))
+    script = os.path.realpath(sys.argv[0]) if sys.argv and sys.argv[0] else ""
+    bin_dir = os.path.dirname(script)
+    if os.path.basename(bin_dir) != "bin":
+        return "default"
+    return os.path.basename(os.path.dirname(bin_dir))
+
+
+def default_cache_path() -> str:
+    """
+    Returns the cache directory of the running plugin.
+    ASDF_PLUGIN_CACHE_DIR overrides $ASDF_DATA_DIR/cache (~/.asdf/cache).
+    """
+    path = os.environ.get("ASDF_PLUGIN_CACHE_DIR")
+    if not path:
+        path = os.path.join(asdf_data_dir(), "cache")
+    return os.path.join(path, plugin_name())
+
+
+class VersionCache(object):
+    """
+    VersionCache stores version lists on disk, together with the ETag /
+    Last-Modified validators of the response they were extracted from.
+
+    path:
+    - the directory to store the cache entries in
+    - default: $ASDF_DATA_DIR/cache/<plugin>
+
+    ttl:
+    - seconds an entry is served without asking upstream at all
+    - after that the entry is revalidated with a conditional request
+    - default: $ASDF_PLUGIN_CACHE_TTL or 0 (always revalidate)
+    """
+
+    def __init__(self, path: str = "", ttl: float | None = None):
+        self.path = path or default_cache_path()
+        if ttl is None:
+            ttl = float(os.environ.get("ASDF_PLUGIN_CACHE_TTL", "0"))
+        self.ttl = ttl
+
+    @staticmethod
+    def enabled() -> bool:
+        """Returns false if caching is disabled by ASDF_PLUGIN_CACHE=0."""
+        return os.environ.get("ASDF_PLUGIN_CACHE", "1") not in ("0", "no", "off")
+
+    def key(self, *parts: any) -> str:
+        """Build a cache key from json serializable parts."""
+        data = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def load(self, key: str) -> dict | None:
+        """Returns the stored entry or None if there is no (valid) entry."""
+        try:
+            with open(os.path.join(self.path, f"{key}.json"), "r") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key: str, entry: dict):
+        """Atomically store an entry, stamped with the current time."""
+        entry = {**entry, "time": time.time()}
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp_path, os.path.join(self.path, f"{key}.json"))
+        except OSError:
+            # a cache that can't be written must never break list-all
+            pass
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Returns true if the entry can be served without revalidation."""
+        return time.time() - entry.get("time", 0) < self.ttl
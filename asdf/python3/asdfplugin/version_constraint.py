@@ -1,6 +1,85 @@
+import io
+import os
 import re
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
 from packaging.version import Version
-from typing import TextIO
+from typing import Iterable, Iterator, TextIO
+
+
+def version_key(version: str) -> tuple[int, ...] | None:
+    """
+    Returns a lightweight sort key for plain release versions (e.g. "1.2.3"
+    or "v1.2"), ordering exactly like packaging's Version.
+    Returns None for anything else (e.g. pre-releases), which needs Version.
+    """
+    parts = version.removeprefix("v").split(".")
+    if not all(part.isdigit() and part.isascii() for part in parts):
+        return None
+    key = [int(part) for part in parts]
+    # like Version, 1.2 == 1.2.0
+    while key and key[-1] == 0:
+        key.pop()
+    return tuple(key)
+
+
+# newline separated plain release versions, see version_keys()
+plain_versions = re.compile(r"(?:v?[0-9]+(?:\.[0-9]+)*\n)*v?[0-9]+(?:\.[0-9]+)*")
+
+
+def version_keys(versions: list[str]) -> list[tuple[int, ...]] | None:
+    """
+    Returns version_key() of all versions, checking them by a single match
+    over all of them instead of version by version.
+    Returns None if any of them isn't a plain release version.
+    """
+    if not versions:
+        return []
+    text = "\n".join(versions)
+    if plain_versions.fullmatch(text) is None:
+        return None
+    # the match guarantees that "v" only occurs as prefix
+    lines = text.replace("v", "").split("\n")
+    if len(lines) != len(versions):
+        # a version contained a newline
+        return None
+    keys = [tuple(map(int, line.split("."))) for line in lines]
+    # trailing zeros are dropped by version_key(), like Version 1.2 == 1.2.0
+    return [key if key[-1] else version_key(".".join(map(str, key))) for key in keys]
+
+
+class SortedVersions(object):
+    """
+    SortedVersions parses a list of versions once and keeps it sorted, so
+    it can be queried by many constraints using binary search.
+    Plain release versions are parsed into int tuples, as soon as there is
+    another version string in the list packaging's Version is used.
+    """
+
+    def __init__(self, versions: Iterable[str]):
+        self.versions = list(versions)
+        self.key = version_key
+        keys = version_keys(self.versions)
+        if keys is None:
+            self.key = Version
+            keys = [Version(v) for v in self.versions]
+        # stable, so equal versions keep their order like list.sort()
+        pairs = sorted(zip(keys, self.versions), key=itemgetter(0))
+        self.keys = [k for k, _ in pairs]
+        self.versions = [v for _, v in pairs]
+
+    def __len__(self) -> int:
+        return len(self.versions)
+
+    def key_for(self, version: str) -> tuple[int, ...] | Version:
+        """Returns the sort key of version, comparable to self.keys."""
+        key = self.key(version)
+        if key is None:
+            # a constraint needs Version, so all keys need to be Version
+            self.key = Version
+            self.keys = [Version(v) for v in self.versions]
+            key = Version(version)
+        return key
 
 
 class VersionConstraint(object):
@@ -11,6 +90,7 @@ class VersionConstraint(object):
 
     def __init__(self, constraints: list[tuple[str, str]]):
         self._original = constraints
+        self._compiled = None
         self.constraints = list()
         for operator, semver_str in constraints:
             version = Version(semver_str)
@@ -39,6 +119,13 @@ class VersionConstraint(object):
     def __str__(self) -> str:
         return ", ".join([" ".join(tpl) for tpl in self._original])
 
+    def intersection(self, *others: "VersionConstraint") -> "VersionConstraint":
+        """Returns a constraint matching the versions matching all of them."""
+        constraints = list(self._original)
+        for other in others:
+            constraints.extend(other._original)
+        return VersionConstraint(constraints)
+
     def test_version(self, version: str) -> bool:
         """Returns true if given version meets all constraints."""
         version_obj = Version(version)
@@ -48,22 +135,108 @@ class VersionConstraint(object):
         """Filters the given list by all constraints."""
         return [v for v in versions if self.test_version(v)]
 
-    def latest_matching(self, versions: list[str]) -> str | None:
+    def latest_matching(self, versions: list[str] | SortedVersions) -> str | None:
         """
         Returns the latest matching version from given list.
         Returns None if no version matches the constraints.
+        Pass a SortedVersions to query the same list multiple times.
         """
-        filtered_versions = self.filter_versions(versions)
-        if not filtered_versions:
-            return None
-        filtered_versions.sort(key=Version)
-        return filtered_versions[-1]
+        if not isinstance(versions, SortedVersions):
+            versions = SortedVersions(versions)
+        return self.compile().latest_matching(versions)
 
+    def compile(self) -> "CompiledConstraint":
+        """Returns the interval form of this constraint."""
+        if self._compiled is None:
+            self._compiled = CompiledConstraint(self._original)
+        return self._compiled
 
-def constraint_from_tf_string(constraint: str) -> VersionConstraint:
+
+class CompiledConstraint(object):
     """
-    Create a VersionConstraint from a constraint string as used inside terraform
-    versioning block (e.g. ">= 1.10.5, < 1.12", "~> 1.10.5" or "1.10.5").
+    CompiledConstraint reduces constraints to one interval of allowed
+    versions (lower & upper bounds, exact matches) minus excluded versions,
+    to be evaluated by binary search on SortedVersions.
+    """
+
+    def __init__(self, constraints: list[tuple[str, str]]):
+        # (version, inclusive)
+        self.lower = list()
+        self.upper = list()
+        self.equal = list()
+        self.excluded = list()
+        for operator, semver_str in constraints:
+            if operator == "=":
+                self.equal.append(semver_str)
+            elif operator == "!=":
+                self.excluded.append(semver_str)
+            elif operator == ">":
+                self.lower.append((semver_str, False))
+            elif operator == ">=":
+                self.lower.append((semver_str, True))
+            elif operator == "<":
+                self.upper.append((semver_str, False))
+            elif operator == "<=":
+                self.upper.append((semver_str, True))
+            elif operator == "~>":
+                version = Version(semver_str)
+                self.lower.append((semver_str, True))
+                self.upper.append((f"{version.major}.{version.minor+1}.0", False))
+            else:
+                raise ValueError(f'operator "{operator}" not supported')
+
+    def bounds(self, versions: SortedVersions) -> tuple[int, int, set]:
+        """
+        Returns the index range [lo, hi) of versions in the interval and
+        the set of keys excluded from it.
+        """
+        # a non plain constraint version switches versions to Version keys
+        for semver_str, _ in self.lower + self.upper:
+            versions.key_for(semver_str)
+        for semver_str in self.equal + self.excluded:
+            versions.key_for(semver_str)
+        lower = [(versions.key_for(v), inc) for v, inc in self.lower]
+        upper = [(versions.key_for(v), inc) for v, inc in self.upper]
+        equal = [versions.key_for(v) for v in self.equal]
+        excluded = {versions.key_for(v) for v in self.excluded}
+        keys = versions.keys
+        lo, hi = 0, len(keys)
+        for key, inclusive in lower:
+            bisect = bisect_left if inclusive else bisect_right
+            lo = max(lo, bisect(keys, key))
+        for key, inclusive in upper:
+            bisect = bisect_right if inclusive else bisect_left
+            hi = min(hi, bisect(keys, key))
+        for key in equal:
+            lo = max(lo, bisect_left(keys, key))
+            hi = min(hi, bisect_right(keys, key))
+        return lo, hi, excluded
+
+    def filter_versions(self, versions: SortedVersions) -> list[str]:
+        """Returns all matching versions in ascending order."""
+        lo, hi, excluded = self.bounds(versions)
+        return [
+            versions.versions[i]
+            for i in range(lo, hi)
+            if versions.keys[i] not in excluded
+        ]
+
+    def latest_matching(self, versions: SortedVersions) -> str | None:
+        """
+        Returns the latest matching version.
+        Returns None if no version matches the constraints.
+        """
+        lo, hi, excluded = self.bounds(versions)
+        for i in range(hi - 1, lo - 1, -1):
+            if versions.keys[i] not in excluded:
+                return versions.versions[i]
+        return None
+
+
+def parse_tf_string(constraint: str) -> list[tuple[str, str]]:
+    """
+    Returns the (operator, version) pairs of a constraint string as used
+    inside terraform versioning block (e.g. ">= 1.10.5, < 1.12").
     """
     constraints = list()
     for item in constraint.split(","):
@@ -72,33 +245,220 @@ def constraint_from_tf_string(constraint: str) -> VersionConstraint:
             constraints.append(("=", tokens[0].strip()))
         else:
             constraints.append((tokens[0].strip(), tokens[1].strip()))
-    return VersionConstraint(constraints)
+    return constraints
+
+
+def constraint_from_tf_string(constraint: str) -> VersionConstraint:
+    """
+    Create a VersionConstraint from a constraint string as used inside terraform
+    versioning block (e.g. ">= 1.10.5, < 1.12", "~> 1.10.5" or "1.10.5").
+    """
+    return VersionConstraint(parse_tf_string(constraint))
+
+
+class ConstraintResolver(object):
+    """
+    ConstraintResolver resolves many constraints against one list of
+    versions, which is parsed & sorted only once.
+    Constraints are deduplicated (regardless of the order of their parts)
+    and each distinct one is compiled & resolved once, later lookups are
+    answered from memory.
+    """
+
+    def __init__(self, versions: Iterable[str] | SortedVersions):
+        if not isinstance(versions, SortedVersions):
+            versions = SortedVersions(versions)
+        self.versions = versions
+        # constraint string -> normalized (operator, version) pairs
+        self._parsed = dict()
+        # normalized (operator, version) pairs -> latest matching version
+        self._latest = dict()
+
+    def normalize(
+        self, constraint: str | VersionConstraint
+    ) -> tuple[tuple[str, str], ...]:
+        """Returns the sorted, distinct (operator, version) pairs."""
+        if isinstance(constraint, VersionConstraint):
+            return tuple(sorted(set(constraint._original)))
+        parts = self._parsed.get(constraint)
+        if parts is None:
+            parts = tuple(sorted(set(parse_tf_string(constraint))))
+            self._parsed[constraint] = parts
+        return parts
+
+    def latest_matching(self, constraint: str | VersionConstraint) -> str | None:
+        """
+        Returns the latest version matching constraint, a terraform
+        constraint string or VersionConstraint.
+        Returns None if no version matches the constraint.
+        """
+        parts = self.normalize(constraint)
+        try:
+            return self._latest[parts]
+        except KeyError:
+            pass
+        latest = CompiledConstraint(parts).latest_matching(self.versions)
+        self._latest[parts] = latest
+        return latest
+
+    def resolve(
+        self, constraints: Iterable[str | VersionConstraint]
+    ) -> list[str | None]:
+        """Returns the latest matching version of each constraint."""
+        return [self.latest_matching(c) for c in constraints]
+
+
+def resolve_constraints(
+    versions: Iterable[str] | SortedVersions,
+    constraints: Iterable[str | VersionConstraint],
+) -> list[str | None]:
+    """
+    Returns the latest of versions matching each of constraints (None if
+    none matches), see ConstraintResolver.
+    """
+    return ConstraintResolver(versions).resolve(constraints)
 
 
-terraform_block_start = re.compile(r"^terraform\s+{\s*$")
-block_end = re.compile(r"^}/s*$")
 constraint_re = r"\s*[!=<>~]{0,2}\s*(?:[0-9]+\.){0,2}[0-9]+\s*"
 constraints_re = r"((?:" + constraint_re + r",)*" + constraint_re + r")"
-terraform_version = re.compile(
-    r'^\s*required_version\s*=\s*"' + constraints_re + r'"\s*$'
+terraform_version = re.compile(r"^" + constraints_re + r"$")
+# the HCL tokens which matter to find the terraform block & its attributes
+tf_token = re.compile(
+    r"""
+    (?P<comment>\#|//)
+    | (?P<block_comment>/\*)
+    | (?P<heredoc><<-?(?P<marker>[A-Za-z_]\w*))
+    | "(?P<string>(?:[^"\\]|\\.)*)"
+    | (?P<open>[{\[(])
+    | (?P<close>[}\])])
+    | (?P<ident>[A-Za-z_][\w-]*)
+    | (?P<assign>=)
+    """,
+    re.VERBOSE,
 )
 
 
-def constraint_from_tf_file(file: TextIO) -> VersionConstraint | None:
+def required_versions_from_tf_file(file: TextIO) -> Iterator[str]:
+    """
+    Yields the "required_version" strings of all terraform blocks in a .tf
+    file, with comments, heredocs and nested or one-line blocks taken into
+    account.
+    Reads the file line by line, only as far as the next string is needed.
     """
-    Create a VersionConstraint from a .tf file which contains a
-    "required_version" constraint line inside a terraform block.
-    Returns None, if no such line can be found.
-    """
-    in_terraform_block = False
-    for line in file.readlines():
-        if terraform_block_start.match(line):
-            in_terraform_block = True
-        elif in_terraform_block:
-            if block_end.match(line):
-                in_terraform_block = False
+    depth = 0
+    # depth of the terraform block's body once entered
+    terraform_depth = None
+    in_comment = False
+    heredoc = None
+    for line in file:
+        if heredoc is not None:
+            if line.strip() == heredoc:
+                heredoc = None
+            continue
+        # tokens since the last brace on this line, e.g. ["terraform"]
+        tokens = list()
+        pos = 0
+        while True:
+            if in_comment:
+                end = line.find("*/", pos)
+                if end < 0:
+                    break
+                pos = end + 2
+                in_comment = False
+            match = tf_token.search(line, pos)
+            if match is None:
+                break
+            pos = match.end()
+            kind = match.lastgroup
+            if kind == "comment":
+                break
+            elif kind == "block_comment":
+                in_comment = True
+            elif kind == "heredoc":
+                heredoc = match.group("marker")
+                break
+            elif kind == "open":
+                if depth == 0 and tokens == ["terraform"]:
+                    terraform_depth = 1
+                depth += 1
+                tokens = list()
+            elif kind == "close":
+                depth -= 1
+                if terraform_depth is not None and depth < terraform_depth:
+                    terraform_depth = None
+                tokens = list()
+            elif kind == "string":
+                if depth == terraform_depth and tokens == ["required_version", "="]:
+                    yield match.group("string")
+                tokens.append('"')
             else:
-                match = terraform_version.match(line)
-                if match:
-                    return constraint_from_tf_string(match.group(1))
-    return None
+                tokens.append(match.group(kind))
+
+
+def required_version_from_tf_file(file: TextIO) -> str | None:
+    """
+    Returns the first "required_version" string of a terraform block in a
+    .tf file, see required_versions_from_tf_file().
+    Returns None, if there is no such attribute.
+    """
+    return next(required_versions_from_tf_file(file), None)
+
+
+def constraint_from_tf_file(file: TextIO) -> VersionConstraint | None:
+    """
+    Create a VersionConstraint from a .tf file which contains
+    "required_version" constraints inside terraform blocks, intersecting
+    the constraints of multiple blocks like terraform does.
+    Returns None, if no such constraint can be found.
+    """
+    constraints = list()
+    for required_version in required_versions_from_tf_file(file):
+        match = terraform_version.match(required_version)
+        if match is not None:
+            constraints.append(constraint_from_tf_string(match.group(1)))
+    if not constraints:
+        return None
+    return constraints[0].intersection(*constraints[1:])
+
+
+def constraint_from_tf_path(path: str) -> VersionConstraint | None:
+    """Like constraint_from_tf_file(), for the .tf file at path."""
+    with open(path, "r") as fh:
+        return constraint_from_tf_file(fh)
+
+
+def read_tf_path(path: str) -> str:
+    """Returns the content of the .tf file at path."""
+    with open(path, "r") as fh:
+        return fh.read()
+
+
+def constraint_from_tf_dir(
+    path: str = ".",
+    max_workers: int = 8,
+) -> VersionConstraint | None:
+    """
+    Create a VersionConstraint from all .tf files of a terraform module
+    directory, intersecting the constraints of all files like terraform
+    does. The files are read concurrently by max_workers threads, but
+    tokenized one after the other: that's CPU bound & holds the GIL.
+    Returns None, if no file contains a constraint.
+    """
+    tf_paths = sorted(
+        entry.path
+        for entry in os.scandir(path)
+        if entry.name.endswith(".tf") and entry.is_file()
+    )
+    if len(tf_paths) > 1 and max_workers > 1:
+        # imported here, it's not needed for single files & costs startup
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tf_paths))) as ex:
+            contents = list(ex.map(read_tf_path, tf_paths))
+    else:
+        contents = [read_tf_path(p) for p in tf_paths]
+    constraints = [constraint_from_tf_file(io.StringIO(c)) for c in contents]
+    constraints = [c for c in constraints if c is not None]
+    if not constraints:
+        return None
+    return constraints[0].intersection(*constraints[1:])
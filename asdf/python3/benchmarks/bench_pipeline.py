@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib
+import statistics
+import subprocess
+import contextlib
+import time
+from unittest import mock
+
+sys.path.append(os.path.dirname(__file__))
+from fake_upstream import FakeUpstream, make_binary, make_tar_gz, make_zip  # noqa
+
+PYTHON3_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MiB = 1024 * 1024
+FILTER = r"^v?((?:[0-9]+\.){2}[0-9]+)$"
+INDEX_FILTER = r'href="/tool/((?:[0-9]+\.){2}[0-9]+)/"'
+
+
+@contextlib.contextmanager
+def plugin_environ(env: dict[str, str]):
+    """
+    Run with env as the only ASDF_* variables in os.environ, which the
+    baseline reads directly & the current code falls back to.
+    """
+    with mock.patch.dict(os.environ):
+        for key in list(os.environ):
+            if key.startswith("ASDF_") or key == "GITHUB_API_TOKEN":
+                del os.environ[key]
+        os.environ.update(env)
+        yield
+
+
+class Pipeline(object):
+    """
+    Pipeline runs the list, download & install phases of the asdfplugin
+    package against a local FakeUpstream, each in a fresh ASDF_*
+    environment. Options the package doesn't have yet (e.g. the baseline)
+    aren't set, features it doesn't have aren't benchmarked.
+    """
+
+    def __init__(self, asdfplugin, upstream: FakeUpstream, size: int, tmp: str):
+        self.asdfplugin = asdfplugin
+        self.upstream = upstream
+        self.size = size
+        # archives to install are kept in tmp, each run gets tmp/run
+        self.tmp = tmp
+
+    def env(self) -> dict[str, str]:
+        run = os.path.join(self.tmp, "run")
+        shutil.rmtree(run, ignore_errors=True)
+        os.makedirs(os.path.join(run, "download"))
+        os.makedirs(os.path.join(run, "install"))
+        return {
+            "ASDF_DOWNLOAD_PATH": os.path.join(run, "download"),
+            "ASDF_INSTALL_PATH": os.path.join(run, "install"),
+            "ASDF_INSTALL_VERSION": "1.2.3",
+            "ASDF_INSTALL_TYPE": "version",
+            "ASDF_PLUGIN_CACHE": "0",
+        }
+
+    def features(self) -> set[str]:
+        """Returns the optional attributes the plugin objects have."""
+        with plugin_environ(self.env()):
+            objects = (
+                self.asdfplugin.GithubLister("owner/repo"),
+                self.asdfplugin.GenericDownloader(self.upstream.url),
+                self.asdfplugin.GenericInstaller(),
+            )
+        names = (
+            "max_workers",
+            "parallel_parts",
+            "stream_extract",
+            "download_member",
+        )
+        return {n for n in names if any(hasattr(o, n) for o in objects)}
+
+    @staticmethod
+    def modify(obj, **kwargs):
+        """Set the attributes of kwargs obj has, ignore the others."""
+        return obj.modify(**{k: v for k, v in kwargs.items() if hasattr(obj, k)})
+
+    def github_lister(self, max_workers: int) -> int:
+        with plugin_environ(self.env()):
+            lister = self.modify(
+                self.asdfplugin.GithubLister("owner/repo"),
+                url=self.upstream.url + "/releases",
+                max_workers=max_workers,
+                cache=None,
+            )
+            return len(lister.get_final_versions(FILTER))
+
+    def generic_lister(self) -> int:
+        with plugin_environ(self.env()):
+            lister = self.modify(
+                self.asdfplugin.GenericLister(self.upstream.url + "/tool"),
+                cache=None,
+            )
+            return len(lister.get_final_versions(INDEX_FILTER))
+
+    def download(self, parts: int) -> int:
+        with plugin_environ(self.env()):
+            self.modify(
+                self.asdfplugin.GenericDownloader(self.upstream.url),
+                artifact_cache=None,
+                parallel_parts=parts,
+                parallel_min_size=1,
+            ).download("tool.bin")
+        return self.size
+
+    def install(self, archive: str, stream: bool) -> int:
+        env = self.env()
+        with plugin_environ(env):
+            shutil.copyfile(
+                os.path.join(self.tmp, archive),
+                os.path.join(env["ASDF_DOWNLOAD_PATH"], "downloaded.file"),
+            )
+            installer = self.asdfplugin.GenericInstaller()
+            self.modify(installer, stream_extract=stream).install({"tool": "tool"})
+        return self.size
+
+    def download_member(self, archive: str) -> int:
+        with plugin_environ(self.env()):
+            self.modify(
+                self.asdfplugin.GenericDownloader(self.upstream.url),
+                artifact_cache=None,
+            ).download_member(archive, "tool")
+        return self.size
+
+
+def benchmarks(pipeline: Pipeline) -> dict[str, callable]:
+    """
+    Returns the benchmarks the package of pipeline supports, the ones
+    without a feature measure the code path the baseline has as well.
+    """
+    features = pipeline.features()
+    optional = {
+        "max_workers": {
+            "list github concurrent": lambda: pipeline.github_lister(8),
+        },
+        "parallel_parts": {
+            "download 4 parts": lambda: pipeline.download(4),
+        },
+        "stream_extract": {
+            "install tar.gz (stream)": lambda: pipeline.install("tool.tar.gz", True),
+            "install zip (stream)": lambda: pipeline.install("tool.zip", True),
+        },
+        "download_member": {
+            "download_member tar.gz": lambda: pipeline.download_member("tool.tar.gz"),
+        },
+    }
+    result = {
+        "list github sequential": lambda: pipeline.github_lister(1),
+        "list generic regex": pipeline.generic_lister,
+        "download": lambda: pipeline.download(1),
+        "install tar.gz (extract all)": lambda: pipeline.install("tool.tar.gz", False),
+        "install zip (extract all)": lambda: pipeline.install("tool.zip", False),
+    }
+    for feature, entries in optional.items():
+        if feature in features:
+            result.update(entries)
+    return result
+
+
+def load_package(path: str):
+    """Returns the asdfplugin package found at path."""
+    sys.path.insert(0, os.path.abspath(path))
+    return importlib.import_module("asdfplugin")
+
+
+def commit(path: str) -> str:
+    """Returns the git commit of path, to tell results apart."""
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=path,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip() or "unknown"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Returns the benchmarks which got slower than baseline by threshold."""
+    setup = ("runs", "size", "releases", "latency", "bandwidth")
+    for key in setup:
+        if results["config"][key] != baseline["config"].get(key):
+            print(f"WARNING {key} differs from baseline {baseline['commit']}")
+    regressions = list()
+    for name, seconds in results["results"].items():
+        before = baseline["results"].get(name)
+        if before and seconds > before * (1 + threshold):
+            regressions.append(
+                f"{name}: {before * 1000:.1f} -> {seconds * 1000:.1f} ms"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmark list, download & install against a local server. "
+            "Save results of one commit with -o base.json, "
+            "compare another commit with -c base.json. "
+            "Benchmark an older checkout, e.g. a git worktree of the "
+            "baseline, with --package <worktree>/asdf/python3."
+        )
+    )
+    parser.add_argument(
+        "--package",
+        default=PYTHON3_PATH,
+        help="directory containing the asdfplugin package to benchmark",
+    )
+    parser.add_argument("-r", "--runs", type=int, default=5)
+    parser.add_argument("--size", type=int, default=32, help="artifact size in MiB")
+    parser.add_argument("--releases", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds")
+    parser.add_argument("--bandwidth", type=float, default=0, help="MiB/s")
+    parser.add_argument("-k", "--filter", default="", help="only run matching")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("-c", "--compare", help="JSON results of a baseline")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    binary = make_binary(args.size * MiB)
+    files = {
+        "/tool.bin": binary,
+        "/tool.tar.gz": make_tar_gz("tool", binary),
+        "/tool.zip": make_zip("tool", binary),
+    }
+    upstream = FakeUpstream(
+        releases=args.releases,
+        files=files,
+        latency=args.latency,
+        bandwidth=int(args.bandwidth * MiB),
+    )
+    with upstream, tempfile.TemporaryDirectory() as tmp:
+        for name in ("tool.tar.gz", "tool.zip"):
+            with open(os.path.join(tmp, name), "wb") as fh:
+                fh.write(files["/" + name])
+        asdfplugin = load_package(args.package)
+        pipeline = Pipeline(asdfplugin, upstream, len(binary), tmp)
+        results = {
+            "commit": commit(args.package),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "results": {},
+        }
+        print(
+            f"{args.size} MiB artifacts, {args.releases} releases, "
+            f"{args.latency * 1000:.0f} ms latency, median of {args.runs} runs"
+        )
+        for name, func in benchmarks(pipeline).items():
+            if args.filter not in name:
+                continue
+            timings = list()
+            for _ in range(args.runs):
+                with open(os.devnull, "w") as devnull:
+                    with contextlib.redirect_stdout(devnull):
+                        start = time.perf_counter()
+                        amount = func()
+                        timings.append(time.perf_counter() - start)
+            seconds = statistics.median(timings)
+            results["results"][name] = seconds
+            if name.startswith("list"):
+                info = f"{amount:10d} versions"
+            else:
+                info = f"{amount / seconds / MiB:10.1f} MiB/s"
+            print(f"{name:<32} {seconds * 1000:9.1f} ms {info}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as fh:
+            regressions = compare(results, json.load(fh), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+PYTHON3_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# what the bin/* scripts of the plugins need before doing any actual work
+ENTRY_POINTS = {
+    "python3 (baseline)": "pass",
+    "import asdfplugin": "import asdfplugin",
+    "list-all (GenericLister)": "import asdfplugin; asdfplugin.GenericLister",
+    "list-all (GithubLister)": "import asdfplugin; asdfplugin.GithubLister",
+    "download (GenericDownloader)": "import asdfplugin; asdfplugin.GenericDownloader",
+    "download (GithubDownloader)": "import asdfplugin; asdfplugin.GithubDownloader",
+    "install (GenericInstaller)": "import asdfplugin; asdfplugin.GenericInstaller",
+    "parse-legacy-file (constraint)": "import asdfplugin; asdfplugin.VersionConstraint",
+    "first request (session)": "from asdfplugin import session; session.get_session()",
+}
+
+
+def measure(code: str, runs: int) -> float:
+    """Returns the median wall time in ms of running code in a new python3."""
+    env = {**os.environ, "PYTHONPATH": PYTHON3_PATH}
+    env.pop("ASDF_PLUGIN_DAEMON", None)
+    timings = list()
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"median of {runs} runs")
+    for name, code in ENTRY_POINTS.items():
+        print(f"{name:<32} {measure(code, runs):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
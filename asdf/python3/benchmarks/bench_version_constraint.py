@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "asdfplugin"))
+import version_constraint  # noqa: E402
+from packaging.version import Version  # noqa: E402
+
+# roughly the shape of releases.hashicorp.com/terraform
+VERSIONS = [
+    f"{major}.{minor}.{patch}"
+    for major in range(2)
+    for minor in range(16)
+    for patch in range(40)
+]
+CONSTRAINTS = [
+    ">= 1.10.5, < 1.12, != 1.11.2",
+    "~> 0.12.31",
+    "1.5.7",
+    "> 0.15, <= 1.3.9",
+]
+
+# required_version of many terraform root modules, most of them repeated
+MODULES = [
+    CONSTRAINTS[i % len(CONSTRAINTS)] if i % 5 else f">= 1.{i % 16}, < 2"
+    for i in range(2000)
+]
+
+
+def reference(constraint: version_constraint.VersionConstraint) -> str | None:
+    """The linear scan + sort latest_matching was implemented with before."""
+    filtered_versions = constraint.filter_versions(VERSIONS)
+    if not filtered_versions:
+        return None
+    filtered_versions.sort(key=Version)
+    return filtered_versions[-1]
+
+
+def main():
+    constraints = [version_constraint.constraint_from_tf_string(c) for c in CONSTRAINTS]
+    sorted_versions = version_constraint.SortedVersions(VERSIONS)
+    for c in constraints:
+        assert reference(c) == c.latest_matching(VERSIONS)
+    benchmarks = {
+        "reference (filter + sort)": lambda: [reference(c) for c in constraints],
+        "latest_matching(list)": lambda: [
+            c.latest_matching(VERSIONS) for c in constraints
+        ],
+        "latest_matching(SortedVersions)": lambda: [
+            c.latest_matching(sorted_versions) for c in constraints
+        ],
+        "resolve_constraints(modules)": lambda: (
+            version_constraint.resolve_constraints(VERSIONS, MODULES)
+        ),
+    }
+    print(
+        f"{len(VERSIONS)} versions, {len(constraints)} constraints per run "
+        f"({len(MODULES)} modules for resolve_constraints)"
+    )
+    for name, func in benchmarks.items():
+        runs = 20
+        seconds = min(timeit.repeat(func, number=runs, repeat=5)) / runs
+        print(f"{name:<34} {seconds * 1000:9.3f} ms/run")
+
+
+if __name__ == "__main__":
+    main()
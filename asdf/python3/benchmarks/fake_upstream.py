@@ -0,0 +1,173 @@
+import io
+import json
+import time
+import random
+import tarfile
+import zipfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_binary(size: int) -> bytes:
+    """Returns size bytes which compress about like an executable (~2.5x)."""
+    rng = random.Random(0)
+    parts = list()
+    total = 0
+    while total < size:
+        pattern = bytes(rng.randrange(256) for _ in range(64))
+        part = rng.randbytes(4096) + pattern * 96
+        parts.append(part)
+        total += len(part)
+    return b"".join(parts)[:size]
+
+
+def make_tar_gz(name: str, content: bytes) -> bytes:
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz", compresslevel=6) as tar:
+        members = (("LICENSE", b"license\n" * 100), (name, content))
+        for member, member_content in members:
+            info = tarfile.TarInfo(member)
+            info.size = len(member_content)
+            info.mode = 0o755
+            tar.addfile(info, io.BytesIO(member_content))
+    return data.getvalue()
+
+
+def make_zip(name: str, content: bytes) -> bytes:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("LICENSE", b"license\n" * 100)
+        archive.writestr(name, content)
+    return data.getvalue()
+
+
+def make_releases(count: int) -> list[dict]:
+    """Release objects shaped (and sized) like GitHub's /releases."""
+    return [
+        {
+            "id": 1000000 + i,
+            "tag_name": f"v{1 + i // 400}.{i // 20 % 20}.{i % 20}",
+            "name": f"release {i}",
+            "prerelease": i % 7 == 0,
+            "draft": False,
+            "body": "* fixed a bug\n" * 40,
+            "assets": [
+                {"name": f"tool_{pf}_{arch}.tar.gz", "size": 12345678}
+                for pf in ("linux", "darwin", "windows")
+                for arch in ("amd64", "arm64")
+            ],
+        }
+        for i in range(count - 1, -1, -1)
+    ]
+
+
+def make_index_html(count: int) -> str:
+    """An index page like releases.hashicorp.com/terraform."""
+    items = "\n".join(
+        f'<li>\n  <a href="/tool/{1 + i // 400}.{i // 20 % 20}.{i % 20}/">'
+        f"tool_{1 + i // 400}.{i // 20 % 20}.{i % 20}</a>\n</li>"
+        for i in range(count)
+    )
+    return f"<!DOCTYPE html>\n<html><body><ul>\n{items}\n</ul></body></html>\n"
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, headers: dict[str, str]):
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        view = memoryview(body)
+        chunk = 64 * 1024
+        for offset in range(0, len(body), chunk):
+            written = self.wfile.write(view[offset : offset + chunk])
+            if self.server.bandwidth:
+                time.sleep(written / self.server.bandwidth)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/releases":
+            self.releases(parse_qs(url.query))
+        elif url.path == "/tool":
+            self.send_body(200, self.server.index_html, {"Content-Type": "text/html"})
+        elif url.path in self.server.files:
+            self.file(self.server.files[url.path])
+        else:
+            self.send_body(404, b"", {})
+
+    def releases(self, query: dict[str, list[str]]):
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        releases = self.server.releases
+        last = max(1, -(-len(releases) // per_page))
+        body = json.dumps(releases[(page - 1) * per_page : page * per_page])
+        headers = {"Content-Type": "application/json"}
+        base = f"http://127.0.0.1:{self.server.server_port}/releases"
+        if page < last:
+            headers["Link"] = (
+                f'<{base}?per_page={per_page}&page={page + 1}>; rel="next", '
+                f'<{base}?per_page={per_page}&page={last}>; rel="last"'
+            )
+        self.send_body(200, body.encode(), headers)
+
+    def file(self, content: bytes):
+        ranges = (self.headers.get("Range") or "").removeprefix("bytes=")
+        first, _, last = ranges.partition("-")
+        if not first.isdigit():
+            self.send_body(200, content, {"Accept-Ranges": "bytes"})
+            return
+        start = int(first)
+        end = len(content) - 1
+        if last.isdigit():
+            end = min(int(last), end)
+        headers = {"Content-Range": f"bytes {start}-{end}/{len(content)}"}
+        self.send_body(206, content[start : end + 1], headers)
+
+
+class FakeUpstream(object):
+    """
+    FakeUpstream serves paginated GitHub /releases JSON, an HTML index page
+    (/tool) and files (with Range support) from a local thread, slowed
+    down by latency seconds per request and bandwidth bytes/s per
+    connection (0 is unlimited).
+    """
+
+    def __init__(
+        self,
+        releases: int = 1000,
+        index_versions: int = 2000,
+        files: dict[str, bytes] | None = None,
+        latency: float = 0.0,
+        bandwidth: int = 0,
+    ):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstreamHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.bandwidth = bandwidth
+        self.server.releases = make_releases(releases)
+        self.server.index_html = make_index_html(index_versions).encode()
+        self.server.files = files or {}
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self) -> "FakeUpstream":
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()